@@ -0,0 +1,11 @@
+import os
+import sys
+
+# backend/ modules import each other as top-level modules; see wsgi.py
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from async_api import app
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host='0.0.0.0', port=int(os.environ.get("PORT", 5000)))
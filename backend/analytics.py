@@ -0,0 +1,204 @@
+"""Turnout and time-series analytics for election results.
+
+Each election's ballots are held per process as two NumPy arrays, cast
+times (epoch seconds) and party indices, read with a projection-only
+cursor in batches.  Later requests only fetch ballots with a larger
+``_id`` and append them; the arrays are rebuilt from scratch when their
+cache entry expires, which picks up any ballot an incremental read missed.
+
+Series are bucketed with a single ``bincount`` over (party, bucket) pairs,
+from which votes per minute, cumulative turnout against eligible voters
+and per-party momentum (share of recent votes minus overall share) follow
+as array operations.
+"""
+import math
+import os
+import threading
+import time
+
+import numpy as np
+
+from cache import TTLCache
+
+
+class VoteSeries:
+    """Cast times and party indices of one election's ballots"""
+
+    def __init__(self):
+        self.times = np.empty(0, dtype=np.float64)
+        self.parties = np.empty(0, dtype=np.int32)
+        self.party_ids = []
+        self.party_index = {}
+        self.last_id = None
+        self.refreshed_at = 0.0
+        self.complete = False
+        self.lock = threading.Lock()
+
+    def index(self, party_id):
+        position = self.party_index.get(party_id)
+        if position is None:
+            position = self.party_index[party_id] = len(self.party_ids)
+            self.party_ids.append(party_id)
+        return position
+
+    def refresh(self, votes, election_id, batch_size):
+        """Append ballots newer than the last one read"""
+        query = {'election_id': election_id}
+        if self.last_id is not None:
+            query['_id'] = {'$gt': self.last_id}
+        cursor = votes.find(query, {'_id': 1, 'voted_at': 1, 'party_id': 1}).batch_size(batch_size)
+
+        times = [self.times]
+        parties = [self.parties]
+        batch_times, batch_parties = [], []
+        for vote in cursor:
+            voted_at = vote.get('voted_at')
+            if voted_at is None:
+                continue
+            # Naive values are server-local, as written by vote()
+            batch_times.append(voted_at.timestamp())
+            batch_parties.append(self.index(vote.get('party_id')))
+            if self.last_id is None or vote['_id'] > self.last_id:
+                self.last_id = vote['_id']
+            if len(batch_times) >= batch_size:
+                times.append(np.array(batch_times, dtype=np.float64))
+                parties.append(np.array(batch_parties, dtype=np.int32))
+                batch_times, batch_parties = [], []
+        times.append(np.array(batch_times, dtype=np.float64))
+        parties.append(np.array(batch_parties, dtype=np.int32))
+
+        self.times = np.concatenate(times)
+        self.parties = np.concatenate(parties)
+        self.refreshed_at = time.monotonic()
+
+
+def compute_series(times, parties, party_count, start, stop, bucket, eligible_voters, momentum_buckets):
+    """Per-bucket counts and derived series for ballots cast in [start, stop)"""
+    bucket_count = max(1, int(math.ceil((stop - start) / bucket)))
+    buckets = np.clip(((times - start) // bucket).astype(np.int64), 0, bucket_count - 1)
+    counts = np.bincount(parties.astype(np.int64) * bucket_count + buckets,
+                         minlength=party_count * bucket_count).reshape(party_count, bucket_count)
+
+    totals = counts.sum(axis=0)
+    cumulative = np.cumsum(totals)
+    party_totals = counts.sum(axis=1)
+    overall_share = party_totals / max(int(party_totals.sum()), 1) * 100
+    recent = counts[:, -momentum_buckets:].sum(axis=1)
+    recent_share = recent / int(recent.sum()) * 100 if recent.sum() else overall_share
+    turnout = cumulative / eligible_voters * 100 if eligible_voters else np.zeros(bucket_count)
+
+    return {
+        'bucket_start': (start + np.arange(bucket_count) * bucket).tolist(),
+        'votes': totals.tolist(),
+        'votes_per_minute': (totals * (60.0 / bucket)).tolist(),
+        'cumulative_votes': cumulative.tolist(),
+        'turnout': turnout.round(2).tolist(),
+        'party_counts': counts,
+        'party_cumulative': counts.cumsum(axis=1),
+        'party_totals': party_totals,
+        'overall_share': overall_share,
+        'momentum': recent_share - overall_share,
+    }
+
+
+class ElectionAnalytics:
+    def __init__(self, get_vote_collection, eligible_voters, bucket_seconds=60, max_buckets=1440,
+                 momentum_buckets=5, refresh_interval=2.0, rebuild_interval=300.0, max_elections=256,
+                 batch_size=5000):
+        self.get_vote_collection = get_vote_collection
+        self.eligible_voters = eligible_voters
+        self.bucket_seconds = bucket_seconds
+        self.max_buckets = max_buckets
+        self.momentum_buckets = momentum_buckets
+        self.refresh_interval = refresh_interval
+        self.batch_size = batch_size
+        self._series = TTLCache('vote_series', maxsize=max_elections, ttl=rebuild_interval)
+
+    def _load(self, election_id, final):
+        series = self._series.get_or_load(election_id, VoteSeries)
+        with series.lock:
+            stale = time.monotonic() - series.refreshed_at >= self.refresh_interval
+            if not series.complete and (stale or series.last_id is None):
+                series.refresh(self.get_vote_collection(), election_id, self.batch_size)
+                # No ballots arrive after an election is final
+                series.complete = final
+            return series.times, series.parties, list(series.party_ids)
+
+    def bucket_for(self, start, stop, requested=None):
+        """Requested bucket width in seconds, widened to keep at most max_buckets"""
+        bucket = max(int(requested or self.bucket_seconds), 1)
+        minimum = (stop - start) / self.max_buckets
+        if bucket < minimum:
+            bucket = int(math.ceil(minimum / 60.0)) * 60
+        return bucket
+
+    def series(self, election_id, parties, bounds=None, final=False, bucket=None, now=None):
+        """JSON-ready analytics for an election; ``bounds`` are (start, end) epoch seconds"""
+        now = time.time() if now is None else now
+        times, party_positions, party_ids = self._load(election_id, final)
+
+        if bounds is not None:
+            start, stop = bounds[0], min(bounds[1], max(now, bounds[0]))
+        elif len(times):
+            start, stop = float(times.min()), float(times.max()) + 1
+        else:
+            start = stop = now
+        bucket = self.bucket_for(start, stop, bucket)
+
+        # Parties without ballots still get a row
+        names = {party['_id']: party.get('name') for party in parties}
+        party_ids = party_ids + [party_id for party_id in names if party_id not in party_ids]
+        eligible = self.eligible_voters()
+        data = compute_series(times, party_positions, len(party_ids), start, stop, bucket, eligible,
+                              self.momentum_buckets)
+
+        party_rows = []
+        for position, party_id in enumerate(party_ids):
+            party_rows.append({
+                '_id': str(party_id),
+                'name': names.get(party_id),
+                'votes': int(data['party_totals'][position]),
+                'share': round(float(data['overall_share'][position]), 2),
+                'momentum': round(float(data['momentum'][position]), 2),
+                'counts': data['party_counts'][position].tolist(),
+                'cumulative': data['party_cumulative'][position].tolist(),
+            })
+        party_rows.sort(key=lambda row: row['votes'], reverse=True)
+
+        total = int(len(times))
+        return {
+            'election_id': str(election_id),
+            'final': final,
+            'bucket_seconds': bucket,
+            'momentum_window_seconds': bucket * self.momentum_buckets,
+            'total_votes': total,
+            'eligible_voters': eligible,
+            'turnout': round(total / eligible * 100, 2) if eligible else 0,
+            'bucket_start': data['bucket_start'],
+            'votes': data['votes'],
+            'votes_per_minute': data['votes_per_minute'],
+            'cumulative_votes': data['cumulative_votes'],
+            'cumulative_turnout': data['turnout'],
+            'parties': party_rows,
+        }
+
+    def forget(self, election_id):
+        self._series.invalidate(election_id)
+
+    def stats(self):
+        return self._series.stats()
+
+
+def create_analytics(get_vote_collection, eligible_voters):
+    """Build the analytics service configured from ANALYTICS_* environment variables"""
+    return ElectionAnalytics(
+        get_vote_collection,
+        eligible_voters,
+        bucket_seconds=int(os.environ.get('ANALYTICS_BUCKET_SECONDS', 60)),
+        max_buckets=int(os.environ.get('ANALYTICS_MAX_BUCKETS', 1440)),
+        momentum_buckets=int(os.environ.get('ANALYTICS_MOMENTUM_BUCKETS', 5)),
+        refresh_interval=float(os.environ.get('ANALYTICS_REFRESH_INTERVAL', 2)),
+        rebuild_interval=float(os.environ.get('ANALYTICS_REBUILD_INTERVAL', 300)),
+        max_elections=int(os.environ.get('ANALYTICS_MAX_ELECTIONS', 256)),
+        batch_size=int(os.environ.get('ANALYTICS_BATCH_SIZE', 5000)),
+    )
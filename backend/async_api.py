@@ -0,0 +1,313 @@
+"""Asynchronous JSON API for the read-heavy endpoints.
+
+An ASGI application serves live results (polled and as a Server-Sent
+Events stream), the voter dashboard data and the election listing with the
+motor driver on one event loop, so a slow or long-lived client holds a
+coroutine instead of a worker thread.  Every other path falls through to
+the Flask app, mounted as a WSGI application.
+
+Run it with an ASGI server, e.g.
+``gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app``.
+
+Results and election lookups are cached per process for
+``ASYNC_RESULTS_TTL`` seconds and concurrent requests for the same key
+share one MongoDB read; live counts come from the Flask app's tally.
+Each election's stream is fed by one polling task per process, whatever
+the number of viewers, reading through the same cache.  The voter's identity is read
+from the Flask session cookie.
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from bson import ObjectId
+from bson.errors import InvalidId
+from motor.motor_asyncio import AsyncIOMotorClient
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from app import app as flask_app, tally, NOT_DELETING, VOTER_ELECTION_PROJECTION, ELECTION_LIST_PROJECTION, ADMIN_PAGE_SIZE
+from cache import TTLCache
+from db import MONGO_URI, DB_NAME, PROFILES, client_options
+from live_results import format_event, Fanout
+from pagination import page_query, finish_page, DESCENDING
+from results import rank_parties
+from schedule import election_bounds, status_at, to_utc, TZ_FIELD, TZ_UTC
+
+_client = None
+_client_pid = None
+
+
+def get_collection(name, profile='default'):
+    """Motor collection for a workload profile; the client is created per process on first use"""
+    global _client, _client_pid
+    if _client is None or _client_pid != os.getpid():
+        _client = AsyncIOMotorClient(MONGO_URI, **client_options())
+        _client_pid = os.getpid()
+    collection = _client[DB_NAME][name]
+    options = PROFILES[profile]()
+    if options:
+        collection = collection.with_options(**options)
+    return collection
+
+
+def close_client():
+    global _client, _client_pid
+    if _client is not None and _client_pid == os.getpid():
+        _client.close()
+    _client = None
+    _client_pid = None
+
+
+class AsyncCache(TTLCache):
+    """TTLCache whose concurrent misses for a key share one async load"""
+
+    def __init__(self, name, maxsize=1024, ttl=2.0):
+        super().__init__(name, maxsize=maxsize, ttl=ttl)
+        self._loading = {}
+
+    async def get_or_load(self, key, loader):
+        """Coroutine version of TTLCache.get_or_load; ``loader()`` returns an awaitable"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        task = self._loading.get(key)
+        if task is None:
+            task = self._loading[key] = asyncio.ensure_future(loader())
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        value = await asyncio.shield(task)
+        if value is not None:
+            self.set(key, value)
+        return value
+
+
+results_cache = AsyncCache('async_results', ttl=float(os.environ.get('ASYNC_RESULTS_TTL', 2)))
+
+
+class AsyncSubscription:
+    """Queue of SSE messages for one connected viewer; None ends the stream"""
+
+    def __init__(self, election_id, max_backlog):
+        self.election_id = election_id
+        self.queue = asyncio.Queue(maxsize=max_backlog)
+
+    def push(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # A viewer that cannot keep up is dropped rather than buffered
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(None)
+
+
+class AsyncBroadcaster(Fanout):
+    """One polling task per election fanned out to every subscriber queue"""
+
+    def __init__(self, load_counts, interval=2.0, keepalive=15.0, max_backlog=100):
+        super().__init__(load_counts, interval, keepalive, max_backlog)
+
+    def subscribe(self, election_id):
+        subscription = AsyncSubscription(election_id, self.max_backlog)
+        with self._lock:
+            self._subscribers.setdefault(election_id, set()).add(subscription)
+            latest = self._latest.get(election_id)
+            producer = self._producers.get(election_id)
+            if producer is None or producer.done():
+                self._producers[election_id] = asyncio.ensure_future(self._produce(election_id))
+        # Late joiners start from the producer's last reading
+        if latest is not None:
+            subscription.push(format_event('snapshot', latest))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.election_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+
+    async def stream(self, election_id):
+        """SSE messages for one viewer until it disconnects or falls behind"""
+        subscription = self.subscribe(election_id)
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscription.queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    message = ': keepalive\n\n'
+                if message is None:
+                    return
+                yield message
+        finally:
+            self.unsubscribe(subscription)
+
+    async def _produce(self, election_id):
+        previous = None
+        while not self._stop_if_idle(election_id):
+            try:
+                counts = await self.load_counts(election_id)
+            except Exception as e:
+                print(f"Async results stream error: {e}")
+                counts = previous
+
+            previous = self._publish_counts(election_id, previous, counts)
+            await asyncio.sleep(self.interval)
+
+
+def session_data(request):
+    """Contents of the Flask session cookie, or {} if missing or invalid"""
+    cookie = request.cookies.get(flask_app.config['SESSION_COOKIE_NAME'])
+    serializer = flask_app.session_interface.get_signing_serializer(flask_app)
+    if not cookie or serializer is None:
+        return {}
+    try:
+        return serializer.loads(cookie, max_age=int(flask_app.permanent_session_lifetime.total_seconds()))
+    except Exception:
+        return {}
+
+
+def _election_summary(election, now):
+    stored_as_utc = election.get(TZ_FIELD) == TZ_UTC
+    start = to_utc(election.get('start_time'), stored_as_utc)
+    end = to_utc(election.get('end_time'), stored_as_utc)
+    return {
+        '_id': str(election['_id']),
+        'name': election.get('name'),
+        'start_time': start.isoformat() if start else None,
+        'end_time': end.isoformat() if end else None,
+        'status': status_at(election_bounds(election), now),
+    }
+
+
+async def _load_results(election_id):
+    stored = await get_collection('results', 'reporting').find_one({'_id': election_id}, {'parties': 1})
+    if stored is not None:
+        return stored['parties']
+
+    # Live counts come from the same tally the Flask results view reads; it
+    # may reconcile against the database, so it runs off the event loop
+    parties, counts = await asyncio.gather(
+        get_collection('parties', 'reporting').find({'election_id': election_id}).to_list(None),
+        run_in_threadpool(tally.counts, election_id)
+    )
+    return rank_parties(parties, counts, 0)['parties']
+
+
+async def _load_election(election_id):
+    election = await get_collection('elections').find_one(dict(NOT_DELETING, _id=election_id), {'_id': 1})
+    # False is cached too, so unknown ids do not reach the database on every request
+    return election is not None
+
+
+async def election_exists(election_id):
+    return await results_cache.get_or_load(('election', election_id), lambda: _load_election(election_id))
+
+
+async def _live_counts(election_id):
+    parties = await results_cache.get_or_load(('results', election_id), lambda: _load_results(election_id))
+    return {str(party['_id']): party['votes'] for party in parties}
+
+
+results_stream = AsyncBroadcaster(
+    _live_counts,
+    interval=float(os.environ.get('RESULTS_STREAM_INTERVAL', 2)),
+    keepalive=float(os.environ.get('RESULTS_STREAM_KEEPALIVE', 15)),
+)
+
+
+async def election_results(request):
+    try:
+        election_id = ObjectId(request.path_params['election_id'])
+        if not await election_exists(election_id):
+            return JSONResponse([])
+        parties = await results_cache.get_or_load(('results', election_id), lambda: _load_results(election_id))
+        return JSONResponse([dict(party, _id=str(party['_id']), election_id=str(party['election_id']))
+                             for party in parties])
+    except InvalidId:
+        return JSONResponse([])
+    except Exception as e:
+        print(f"Async results error: {e}")
+        return JSONResponse([])
+
+
+async def election_results_stream(request):
+    """Server-Sent Events stream of live results"""
+    try:
+        election_id = ObjectId(request.path_params['election_id'])
+        found = await election_exists(election_id)
+    except Exception as e:
+        print(f"Async results stream error: {e}")
+        found = False
+    if not found:
+        return JSONResponse({'error': 'Election not found'}, status_code=404)
+    return StreamingResponse(results_stream.stream(election_id), media_type='text/event-stream',
+                             headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+async def voter_elections(request):
+    """Voter dashboard data: visible elections, newest first, with has_voted"""
+    data = session_data(request)
+    if data.get('is_admin') or not data.get('user_id'):
+        return JSONResponse({'error': 'Voter login required'}, status_code=401)
+    try:
+        voter_id = ObjectId(data['user_id'])
+        # Read from the primary so a voter sees their own ballot right after casting it
+        query = dict(NOT_DELETING, start_time={'$exists': True}, end_time={'$exists': True})
+        elections, votes = await asyncio.gather(
+            get_collection('elections').find(query, VOTER_ELECTION_PROJECTION).sort('start_time', -1).to_list(None),
+            get_collection('votes').find({'voter_id': voter_id}, {'_id': 0, 'election_id': 1}).to_list(None)
+        )
+        voted = {vote['election_id'] for vote in votes}
+        now = time.time()
+        return JSONResponse({'elections': [
+            dict(_election_summary(election, now), has_voted=election['_id'] in voted) for election in elections
+        ]})
+    except Exception as e:
+        print(f"Async voter dashboard error: {e}")
+        return JSONResponse({'error': 'Error loading dashboard'}, status_code=500)
+
+
+async def elections_listing(request):
+    """Elections newest first, with keyset pagination"""
+    data = session_data(request)
+    if not data.get('user_id') and not data.get('is_admin'):
+        return JSONResponse({'error': 'Login required'}, status_code=401)
+    try:
+        limit = min(int(request.query_params.get('limit', ADMIN_PAGE_SIZE)), 500)
+        query, sort = page_query(NOT_DELETING, sort_field='created_at', direction=DESCENDING,
+                                 cursor=request.query_params.get('cursor'))
+    except ValueError:
+        return JSONResponse({'error': 'Invalid cursor or limit'}, status_code=400)
+    try:
+        documents = await get_collection('elections', 'reporting').find(query, ELECTION_LIST_PROJECTION) \
+            .sort(sort).limit(limit + 1).to_list(None)
+        elections, next_cursor = finish_page(documents, limit, 'created_at')
+        now = time.time()
+        return JSONResponse({'elections': [_election_summary(election, now) for election in elections],
+                             'next_cursor': next_cursor})
+    except Exception as e:
+        print(f"Async elections error: {e}")
+        return JSONResponse({'elections': [], 'next_cursor': None})
+
+
+@asynccontextmanager
+async def lifespan(_):
+    yield
+    close_client()
+
+
+app = Starlette(
+    routes=[
+        Route('/api/election_results/{election_id}', election_results),
+        Route('/api/election_results/{election_id}/stream', election_results_stream),
+        Route('/api/voter/elections', voter_elections),
+        Route('/api/elections', elections_listing),
+        Mount('/', WSGIMiddleware(flask_app, workers=int(os.environ.get('ASYNC_WSGI_THREADS', 10)))),
+    ],
+    lifespan=lifespan,
+)
@@ -0,0 +1,83 @@
+"""Idempotent ballot commits.
+
+Every ballot form carries a random token that is stored on the vote
+document.  A ballot is written with one upsert keyed by (voter, election),
+so a retried submission can never create a second vote, and the stored
+token tells a replay of the same form (which gets the original outcome)
+from a genuine second attempt to vote (a duplicate).  Outcomes are kept in
+a per-process token cache so replays are answered without a database read.
+
+Party vote counts are not touched here: the tally engine derives them from
+the votes collection, so a ballot that is written but never acknowledged
+is still counted once.
+"""
+import os
+import secrets
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from cache import TTLCache
+
+TOKEN_FIELD = 'ballot_token'
+
+
+def new_ballot_token():
+    return secrets.token_urlsafe(16)
+
+
+class BallotCommitter:
+    def __init__(self, get_vote_collection, token_ttl=3600.0, max_tokens=100000):
+        self.get_vote_collection = get_vote_collection
+        self._outcomes = TTLCache('ballot_tokens', maxsize=max_tokens, ttl=token_ttl)
+
+    def replayed(self, token, voter_id, election_id):
+        """Outcome already returned for this form submission, or None"""
+        if not token:
+            return None
+        entry = self._outcomes.get(token)
+        if entry is None or entry[:2] != (voter_id, election_id):
+            return None
+        return entry[2]
+
+    def remember(self, token, voter_id, election_id, outcome):
+        # 'queued' and 'failed' are not final; a retry must try the ballot again
+        if token and outcome in ('recorded', 'duplicate'):
+            self._outcomes.set(token, (voter_id, election_id, outcome))
+
+    def resolve_duplicate(self, token, stored_token):
+        """'recorded' when the stored ballot came from this same form, else 'duplicate'"""
+        return 'recorded' if token and token == stored_token else 'duplicate'
+
+    def stored_token(self, voter_id, election_id):
+        vote = self.get_vote_collection().find_one({'voter_id': voter_id, 'election_id': election_id},
+                                                   {'_id': 0, TOKEN_FIELD: 1})
+        return vote.get(TOKEN_FIELD) if vote else None
+
+    def commit(self, vote_data):
+        """Write a ballot once; returns 'inserted', 'recorded' (a replay) or 'duplicate'"""
+        token = vote_data.get(TOKEN_FIELD)
+        key = {'voter_id': vote_data['voter_id'], 'election_id': vote_data['election_id']}
+        try:
+            existing = self.get_vote_collection().find_one_and_update(
+                key, {'$setOnInsert': vote_data}, projection={'_id': 0, TOKEN_FIELD: 1},
+                upsert=True, return_document=ReturnDocument.BEFORE
+            )
+        except DuplicateKeyError:
+            # Lost an upsert race on the unique (voter, election) index
+            return self.resolve_duplicate(token, self.stored_token(key['voter_id'], key['election_id']))
+        if existing is None:
+            return 'inserted'
+        return self.resolve_duplicate(token, existing.get(TOKEN_FIELD))
+
+    def stats(self):
+        return self._outcomes.stats()
+
+
+def create_ballot_committer(get_vote_collection):
+    """Build a committer configured from BALLOT_TOKEN_TTL and BALLOT_TOKEN_CACHE_SIZE"""
+    return BallotCommitter(
+        get_vote_collection,
+        token_ttl=float(os.environ.get('BALLOT_TOKEN_TTL', 3600)),
+        max_tokens=int(os.environ.get('BALLOT_TOKEN_CACHE_SIZE', 100000)),
+    )
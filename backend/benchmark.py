@@ -0,0 +1,293 @@
+"""Load test for the voting flows.
+
+Seeds a throwaway database with voters, elections and parties, then drives
+concurrent virtual voters through voter_login -> voter_dashboard -> vote
+(GET and POST) -> election_results using Flask's test client, and reports
+requests/s, p50/p95/p99 latency and MongoDB commands per request for each
+route.
+
+    python benchmark.py --backend mongomock --voters 200 --concurrency 16
+    python benchmark.py --backend mongod --mongo-uri mongodb://localhost:27017
+
+The mongomock backend needs `pip install mongomock`; it measures the Flask
+and Python overhead of each route.  Commands are counted as top-level
+collection calls (a cursor's later batches are not counted), and the
+correlated ``$lookup`` that mongomock lacks is evaluated once per outer
+document.  The mongod backend needs an explicit ``--mongo-uri`` so a run
+can never reach the production database.
+"""
+import argparse
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+BENCHMARK_DB = 'voting_benchmark'
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+class CommandCounter:
+    """pymongo command listener counting commands issued by each thread"""
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def reset(self):
+        self._local.count = 0
+
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+    def started(self, event):
+        self._local.count = self.count() + 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    def wrap(self, method):
+        """Count calls to method, ignoring calls it makes itself"""
+        local = self._local
+
+        @functools.wraps(method)
+        def counted(*args, **kwargs):
+            depth = getattr(local, 'depth', 0)
+            if depth == 0:
+                self.started(None)
+            local.depth = depth + 1
+            try:
+                return method(*args, **kwargs)
+            finally:
+                local.depth = depth
+        return counted
+
+
+# mongomock collection methods that each stand for one server command
+MOCK_COMMANDS = ('find', 'find_one', 'insert_one', 'insert_many', 'replace_one', 'update_one', 'update_many',
+                 'delete_one', 'delete_many', 'find_one_and_update', 'find_one_and_replace',
+                 'find_one_and_delete', 'aggregate', 'count_documents', 'estimated_document_count',
+                 'distinct', 'bulk_write')
+
+
+def _bind(value, variables):
+    """Replace $$name references in a $lookup sub-pipeline with their values"""
+    if isinstance(value, str) and value.startswith('$$') and value[2:] in variables:
+        return variables[value[2:]]
+    if isinstance(value, dict):
+        return {key: _bind(item, variables) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_bind(item, variables) for item in value]
+    return value
+
+
+def patch_mongomock(mongomock, counter):
+    """Count mongomock commands and evaluate $lookup with let/pipeline"""
+    from mongomock import aggregate
+    from mongomock.collection import Collection
+
+    for name in MOCK_COMMANDS:
+        setattr(Collection, name, counter.wrap(getattr(Collection, name)))
+
+    plain_lookup = aggregate._PIPELINE_HANDLERS['$lookup']
+
+    def lookup(in_collection, database, options):
+        if 'let' not in options:
+            return plain_lookup(in_collection, database, options)
+        # Only field references ('$field') are supported as let expressions
+        joined = []
+        for doc in in_collection:
+            variables = {name: doc.get(expression[1:]) for name, expression in options['let'].items()}
+            matches = list(database[options['from']].aggregate(_bind(options['pipeline'], variables)))
+            joined.append(dict(doc, **{options['as']: matches}))
+        return joined
+
+    aggregate._PIPELINE_HANDLERS['$lookup'] = lookup
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def configure_backend(args):
+    """Point db.py at the benchmark database before the app is imported"""
+    os.environ['MONGO_DB_NAME'] = BENCHMARK_DB
+    # Every virtual voter logs in from the same address
+    os.environ.setdefault('LOGIN_IP_LIMIT', '0')
+    if args.mongo_uri:
+        os.environ['MONGO_URI'] = args.mongo_uri
+
+    import db
+
+    counter = CommandCounter()
+    if args.backend == 'mongomock':
+        try:
+            import mongomock
+        except ImportError:
+            sys.exit("mongomock is not installed: pip install mongomock")
+        patch_mongomock(mongomock, counter)
+        mock_client = mongomock.MongoClient()
+        db.get_client = lambda: mock_client
+        return counter
+
+    from pymongo import monitoring
+    monitoring.register(counter)
+    return counter
+
+
+def seed(app_module, voters, elections, parties):
+    """Create voters, active elections and parties; returns (emails, {election_id: [party ids]})"""
+    from werkzeug.security import generate_password_hash
+    from schedule import TZ_FIELD, TZ_UTC
+
+    database = app_module.get_user_collection().database
+    for name in ('users', 'elections', 'parties', 'votes'):
+        database.drop_collection(name)
+    app_module.init_db()
+
+    # One hash shared by every seeded voter keeps seeding fast
+    password_hash = generate_password_hash(BENCHMARK_PASSWORD)
+    now = datetime.now(timezone.utc)
+    emails = [f"voter{i}@benchmark.test" for i in range(voters)]
+    app_module.get_user_collection().insert_many([{
+        'name': f"Voter {i}",
+        'email': email,
+        'password_hash': password_hash,
+        'student_id': f"BENCH{i:06d}",
+        'is_admin': False,
+        'created_at': datetime.now()
+    } for i, email in enumerate(emails)])
+
+    ballots = {}
+    for e in range(elections):
+        result = app_module.get_election_collection().insert_one({
+            'name': f"Benchmark Election {e}",
+            'start_time': now - timedelta(hours=1),
+            'end_time': now + timedelta(hours=1),
+            TZ_FIELD: TZ_UTC,
+            'created_at': datetime.now()
+        })
+        inserted = app_module.get_party_collection().insert_many([{
+            'election_id': result.inserted_id,
+            'name': f"Party {p}",
+            'description': '',
+            'logo_filename': None,
+            'votes': 0,
+            'created_at': datetime.now()
+        } for p in range(parties)])
+        ballots[result.inserted_id] = [str(party_id) for party_id in inserted.inserted_ids]
+    app_module.election_schedule.invalidate()
+    return emails, ballots
+
+
+def run_voter(app_module, number, email, ballots, counter, samples, lock):
+    """One virtual voter's session; appends (route, seconds, commands, ok) samples"""
+    client = app_module.app.test_client()
+
+    def timed(route, method, path, expected, data=None):
+        if counter is not None:
+            counter.reset()
+        started = time.perf_counter()
+        response = client.open(path, method=method, data=data)
+        elapsed = time.perf_counter() - started
+        commands = counter.count() if counter is not None else None
+        # Routes report failures by redirecting elsewhere, so check the target too
+        ok = response.status_code == 200 if expected == 200 else response.location.endswith(expected)
+        with lock:
+            samples.append((route, elapsed, commands, ok))
+        return response
+
+    timed('voter_login', 'POST', '/voter_login', '/voter_dashboard',
+          {'email': email, 'password': BENCHMARK_PASSWORD})
+    timed('voter_dashboard', 'GET', '/voter_dashboard', 200)
+    for election_id, party_ids in ballots.items():
+        party_id = party_ids[number % len(party_ids)]
+        timed('vote_form', 'GET', f'/vote/{election_id}', 200)
+        timed('vote_submit', 'POST', f'/vote/{election_id}', '/voter_dashboard', {'party_id': party_id})
+        timed('election_results', 'GET', f'/election_results/{election_id}', 200)
+    timed('voter_dashboard', 'GET', '/voter_dashboard', 200)
+
+
+def report(samples, wall_seconds):
+    routes = {}
+    for route, elapsed, commands, ok in samples:
+        routes.setdefault(route, []).append((elapsed, commands, ok))
+
+    summary = {'total_requests': len(samples), 'wall_seconds': wall_seconds,
+               'requests_per_second': len(samples) / wall_seconds if wall_seconds else 0.0,
+               'routes': {}}
+    for route, rows in routes.items():
+        latencies = sorted(elapsed for elapsed, _, _ in rows)
+        commands = [c for _, c, _ in rows if c is not None]
+        summary['routes'][route] = {
+            'requests': len(rows),
+            'errors': sum(1 for _, _, ok in rows if not ok),
+            'requests_per_second': len(rows) / wall_seconds if wall_seconds else 0.0,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'mongo_ops_per_request': (sum(commands) / len(commands)) if commands else None
+        }
+    return summary
+
+
+def print_report(summary):
+    print(f"\n{summary['total_requests']} requests in {summary['wall_seconds']:.2f}s "
+          f"({summary['requests_per_second']:.1f} req/s)\n")
+    print(f"{'route':<18}{'reqs':>7}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'ops/req':>9}{'errors':>8}")
+    for route, stats in summary['routes'].items():
+        ops = stats['mongo_ops_per_request']
+        print(f"{route:<18}{stats['requests']:>7}{stats['requests_per_second']:>9.1f}"
+              f"{stats['p50_ms']:>9.1f}{stats['p95_ms']:>9.1f}{stats['p99_ms']:>9.1f}"
+              f"{(f'{ops:.1f}' if ops is not None else 'n/a'):>9}{stats['errors']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the voting flows')
+    parser.add_argument('--backend', choices=['mongomock', 'mongod'], default='mongomock')
+    parser.add_argument('--mongo-uri', default=None, help='mongod URI (required with --backend mongod)')
+    parser.add_argument('--voters', type=int, default=200)
+    parser.add_argument('--elections', type=int, default=2)
+    parser.add_argument('--parties', type=int, default=4)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--json', dest='json_path', help='also write the report to this file')
+    args = parser.parse_args()
+    if args.backend == 'mongod' and not args.mongo_uri:
+        parser.error('--mongo-uri is required with --backend mongod')
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    counter = configure_backend(args)
+    import app as app_module
+
+    print(f"Seeding {args.voters} voters, {args.elections} elections x {args.parties} parties "
+          f"in '{BENCHMARK_DB}' ({args.backend})...")
+    emails, ballots = seed(app_module, args.voters, args.elections, args.parties)
+
+    samples = []
+    lock = threading.Lock()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [pool.submit(run_voter, app_module, number, email, ballots, counter, samples, lock)
+                   for number, email in enumerate(emails)]
+        for future in futures:
+            future.result()
+    wall_seconds = time.perf_counter() - started
+    app_module.shutdown()
+
+    summary = report(samples, wall_seconds)
+    print_report(summary)
+    if args.json_path:
+        with open(args.json_path, 'w') as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
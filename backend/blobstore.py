@@ -0,0 +1,151 @@
+"""Content-addressed, reference-counted file storage for uploads.
+
+Each blob is a set of files named after a digest of the uploaded content,
+tracked by a ``blobs`` document holding the file names and a reference
+count.  Storing content that is already present only takes another
+reference, so re-uploading the same logo costs no disk space.  Releasing
+the last reference marks the blob orphaned; ``sweep()`` (run from
+gc_uploads.py) deletes orphans once a grace period has passed, along with
+stray files no blob or party refers to.  The sweeper marks a blob as being
+swept before removing its files and only then deletes the document;
+``acquire()`` waits for such a blob to be gone before writing it again.
+"""
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+DEFAULT_UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
+# Seconds acquire() waits for a sweep of the same blob before taking it over
+SWEEP_WAIT = 30.0
+
+
+class BlobStore:
+    def __init__(self, folder, get_collection):
+        self.folder = folder
+        self.get_collection = get_collection
+
+    def path(self, filename):
+        return os.path.join(self.folder, filename)
+
+    def _write(self, filename, content):
+        # Written aside and renamed so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.folder, prefix=f"{filename}.", suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+        os.replace(tmp_path, self.path(filename))
+
+    def _take_reference(self, blobs, digest):
+        """Increment an existing blob's refs, waiting out a sweep in progress; None if absent"""
+        deadline = time.monotonic() + SWEEP_WAIT
+        while True:
+            doc = blobs.find_one_and_update(
+                {'_id': digest, 'sweeping': {'$ne': True}},
+                {'$inc': {'refs': 1}, '$unset': {'orphaned_at': ''}},
+                projection={'files': 1},
+                return_document=ReturnDocument.AFTER
+            )
+            if doc is not None or not blobs.count_documents({'_id': digest, 'sweeping': True}, limit=1):
+                return doc
+            if time.monotonic() >= deadline:
+                # The sweeper died mid-sweep; missing files are rebuilt below
+                return blobs.find_one_and_update(
+                    {'_id': digest, 'sweeping': True},
+                    {'$inc': {'refs': 1}, '$unset': {'orphaned_at': '', 'sweeping': ''}},
+                    projection={'files': 1},
+                    return_document=ReturnDocument.AFTER
+                )
+            time.sleep(0.05)
+
+    def acquire(self, digest, build):
+        """Take a reference to blob ``digest``; returns its file names
+
+        ``build()`` returns ``{filename: bytes}`` and is only called when the
+        blob is not stored yet (or its files have gone missing).
+        """
+        blobs = self.get_collection()
+        doc = self._take_reference(blobs, digest)
+        if doc and all(os.path.exists(self.path(name)) for name in doc['files']):
+            return doc['files']
+
+        try:
+            files = build()
+        except Exception:
+            if doc:
+                self.release(digest)
+            raise
+        for filename, content in files.items():
+            self._write(filename, content)
+        blobs.update_one({'_id': digest}, {
+            '$set': {'files': sorted(files), 'size': sum(len(content) for content in files.values())},
+            '$setOnInsert': {'created_at': datetime.now(timezone.utc)},
+            '$inc': {'refs': 0 if doc else 1}
+        }, upsert=True)
+        return sorted(files)
+
+    def release(self, digest):
+        """Drop a reference; the blob is left for the sweeper once unreferenced"""
+        blobs = self.get_collection()
+        doc = blobs.find_one_and_update({'_id': digest}, {'$inc': {'refs': -1}},
+                                        projection={'refs': 1}, return_document=ReturnDocument.AFTER)
+        if doc and doc['refs'] <= 0:
+            blobs.update_one({'_id': digest, 'refs': {'$lte': 0}},
+                             {'$set': {'orphaned_at': datetime.now(timezone.utc)}})
+
+    def sweep(self, referenced=(), grace=3600, dry_run=False):
+        """Delete orphaned blobs and stray files older than ``grace`` seconds
+
+        ``referenced`` names files that are in use without a blob (uploads
+        from before the blob store).  Returns a summary dict.
+        """
+        blobs = self.get_collection()
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace)
+        report = {'blobs_removed': 0, 'files_removed': 0, 'bytes_freed': 0, 'dry_run': dry_run}
+
+        orphan_query = {'refs': {'$lte': 0}, 'orphaned_at': {'$lt': cutoff}}
+        for doc in list(blobs.find(orphan_query, {'_id': 1})):
+            # Claimed atomically, so a blob re-acquired meanwhile is kept; its
+            # files go before the document so acquire() never writes them
+            # back only to see them removed
+            if dry_run:
+                doc = blobs.find_one(dict(orphan_query, _id=doc['_id']), {'files': 1})
+            else:
+                doc = blobs.find_one_and_update(dict(orphan_query, _id=doc['_id']), {'$set': {'sweeping': True}},
+                                                projection={'files': 1})
+            if doc is None:
+                continue
+            report['blobs_removed'] += 1
+            for filename in doc.get('files', []):
+                self._remove(filename, report, dry_run)
+            if not dry_run:
+                blobs.delete_one({'_id': doc['_id'], 'sweeping': True})
+
+        # Anything left on disk that nothing refers to: abandoned temp files,
+        # files of blobs whose document was lost, and unreferenced old uploads
+        known = set(referenced)
+        for doc in blobs.find({}, {'files': 1}):
+            known.update(doc.get('files', []))
+        oldest = time.time() - grace
+        for entry in os.scandir(self.folder):
+            if entry.is_file() and entry.name not in known and entry.stat().st_mtime < oldest:
+                self._remove(entry.name, report, dry_run)
+        return report
+
+    def _remove(self, filename, report, dry_run):
+        try:
+            size = os.path.getsize(self.path(filename))
+            if not dry_run:
+                os.remove(self.path(filename))
+        except FileNotFoundError:
+            return
+        report['files_removed'] += 1
+        report['bytes_freed'] += size
+
+
+def create_blob_store(get_collection):
+    """Blob store in UPLOAD_FOLDER (default: backend/uploads)"""
+    folder = os.environ.get('UPLOAD_FOLDER', DEFAULT_UPLOAD_FOLDER)
+    os.makedirs(folder, exist_ok=True)
+    return BlobStore(folder, get_collection)
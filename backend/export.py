@@ -0,0 +1,190 @@
+"""Streaming export of election ballots and tallies.
+
+Ballots are read with a server-side cursor in ``batch_size`` batches and
+joined with party names from a lookup of the election's parties, then
+encoded incrementally as CSV, JSON Lines or (with pyarrow installed)
+Parquet row groups, optionally gzip-compressed on the fly.  Every stage is
+a generator, so memory use is bounded by one batch however many ballots
+the election has.
+"""
+import csv
+import io
+import json
+import os
+import zlib
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+from results import vote_count_pipeline
+
+FORMATS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+    'parquet': 'application/vnd.apache.parquet',
+}
+BALLOT_FIELDS = ('vote_id', 'election_id', 'party_id', 'party_name', 'voted_at')
+TALLY_FIELDS = ('election_id', 'party_id', 'party_name', 'votes')
+
+
+def available_formats():
+    return [fmt for fmt in FORMATS if fmt != 'parquet' or pyarrow is not None]
+
+
+def _text(value):
+    if value is None:
+        return None
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def party_names(parties, election_id):
+    return {party['_id']: party.get('name') for party in parties.find({'election_id': election_id}, {'name': 1})}
+
+
+def ballot_rows(votes, parties, election_id, batch_size=5000, include_voters=False):
+    """Yield one row per ballot; voter ids are left out unless asked for"""
+    names = party_names(parties, election_id)
+    projection = {'party_id': 1, 'voted_at': 1}
+    if include_voters:
+        projection['voter_id'] = 1
+    for vote in votes.find({'election_id': election_id}, projection).batch_size(batch_size):
+        row = {
+            'vote_id': str(vote['_id']),
+            'election_id': str(election_id),
+            'party_id': _text(vote.get('party_id')),
+            'party_name': names.get(vote.get('party_id')),
+            'voted_at': _text(vote.get('voted_at')),
+        }
+        if include_voters:
+            row['voter_id'] = _text(vote.get('voter_id'))
+        yield row
+
+
+def tally_rows(votes, parties, election_id):
+    """Yield one row per party with its vote count, most votes first"""
+    names = party_names(parties, election_id)
+    pipeline = vote_count_pipeline(election_id)
+    counts = {row['_id']: row['count'] for row in votes.aggregate(pipeline)}
+    for party_id in sorted(set(names) | set(counts), key=lambda party_id: -counts.get(party_id, 0)):
+        yield {
+            'election_id': str(election_id),
+            'party_id': _text(party_id),
+            'party_name': names.get(party_id),
+            'votes': counts.get(party_id, 0),
+        }
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def csv_chunks(rows, fields, batch_size=5000):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+    writer.writeheader()
+    for batch in _batches(rows, batch_size):
+        writer.writerows(batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def jsonl_chunks(rows, fields, batch_size=5000):
+    for batch in _batches(rows, batch_size):
+        yield ''.join(json.dumps(row) + '\n' for row in batch).encode('utf-8')
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes to the caller instead of storing them"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def parquet_chunks(rows, fields, batch_size=5000):
+    """One Parquet row group per batch (requires pyarrow)"""
+    if pyarrow is None:
+        raise ValueError('Parquet export requires pyarrow')
+    schema = pyarrow.schema([(field, pyarrow.int64() if field == 'votes' else pyarrow.string())
+                             for field in fields])
+    sink = _ChunkSink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for batch in _batches(rows, batch_size):
+        writer.write_table(pyarrow.Table.from_pylist(batch, schema=schema))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {'csv': csv_chunks, 'jsonl': jsonl_chunks, 'parquet': parquet_chunks}
+
+
+def gzip_chunks(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(votes, parties, election_id, fmt='csv', kind='ballots', compress=False,
+                  batch_size=5000, include_voters=False, gzip_level=6):
+    """Generator of encoded export bytes"""
+    if fmt not in available_formats():
+        raise ValueError(f"Unsupported export format: {fmt}")
+    if kind == 'ballots':
+        rows = ballot_rows(votes, parties, election_id, batch_size, include_voters)
+        fields = BALLOT_FIELDS + (('voter_id',) if include_voters else ())
+    elif kind == 'tallies':
+        rows = tally_rows(votes, parties, election_id)
+        fields = TALLY_FIELDS
+    else:
+        raise ValueError(f"Unsupported export kind: {kind}")
+    chunks = ENCODERS[fmt](rows, fields, batch_size)
+    return gzip_chunks(chunks, gzip_level) if compress else chunks
+
+
+def export_filename(election_id, fmt, kind='ballots', compress=False):
+    return f"election_{election_id}_{kind}.{fmt}" + ('.gz' if compress else '')
+
+
+def content_type(fmt, compress=False):
+    return 'application/gzip' if compress else FORMATS[fmt]
+
+
+def export_settings():
+    """Batch size and gzip level from EXPORT_BATCH_SIZE and EXPORT_GZIP_LEVEL"""
+    return {
+        'batch_size': int(os.environ.get('EXPORT_BATCH_SIZE', 5000)),
+        'gzip_level': int(os.environ.get('EXPORT_GZIP_LEVEL', 6)),
+    }
@@ -0,0 +1,48 @@
+"""Export an election's ballots or tallies.
+
+    python export_results.py <election_id> -o ballots.csv
+    python export_results.py <election_id> --format jsonl --gzip -o ballots.jsonl.gz
+    python export_results.py <election_id> --kind tallies --format parquet -o tallies.parquet
+
+Output is written as it is produced; ``-o -`` (the default) writes to stdout.
+"""
+import argparse
+import sys
+
+from bson import ObjectId
+
+from db import get_db
+from export import export_stream, available_formats, export_settings
+
+
+def main():
+    settings = export_settings()
+    parser = argparse.ArgumentParser(description='Export election results')
+    parser.add_argument('election_id')
+    parser.add_argument('--format', choices=available_formats(), default='csv')
+    parser.add_argument('--kind', choices=['ballots', 'tallies'], default='ballots')
+    parser.add_argument('--gzip', action='store_true', help='compress the output')
+    parser.add_argument('--include-voters', action='store_true', help='add voter ids to ballot rows')
+    parser.add_argument('--batch-size', type=int, default=settings['batch_size'])
+    parser.add_argument('-o', '--output', default='-')
+    args = parser.parse_args()
+
+    db = get_db()
+    election_id = ObjectId(args.election_id)
+    if db['elections'].find_one({'_id': election_id}, {'_id': 1}) is None:
+        sys.exit(f"Election {args.election_id} not found")
+
+    chunks = export_stream(db['votes'], db['parties'], election_id, fmt=args.format, kind=args.kind,
+                           compress=args.gzip, batch_size=args.batch_size, include_voters=args.include_voters,
+                           gzip_level=settings['gzip_level'])
+    out = sys.stdout.buffer if args.output == '-' else open(args.output, 'wb')
+    try:
+        for chunk in chunks:
+            out.write(chunk)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""Reclaim upload storage.
+
+    python gc_uploads.py                  # delete orphaned logos and stray files
+    python gc_uploads.py --dry-run        # report what would be deleted
+    python gc_uploads.py --adopt-legacy   # first move timestamp-named logos into the blob store
+
+Files are only deleted once they have been unreferenced for --grace
+seconds, so uploads in flight are never swept.  Adopting legacy uploads
+re-encodes each party's logo into content-addressed variants; duplicate
+copies of the same image collapse into one blob and the old files are
+swept as strays.
+"""
+import argparse
+import os
+
+from db import get_db
+from blobstore import create_blob_store
+from images import logo_digest, encode_logo, logo_fields, InvalidImage
+
+LEGACY_QUERY = {'logo_blob': {'$exists': False}, 'logo_filename': {'$nin': [None, '']}}
+
+
+def adopt_legacy(store, parties):
+    """Move parties' pre-blob-store logos into the store; returns the number adopted"""
+    adopted = 0
+    for party in parties.find(LEGACY_QUERY, {'logo_filename': 1}):
+        path = store.path(party['logo_filename'])
+        if not os.path.exists(path):
+            print(f"Missing logo for party {party['_id']}: {party['logo_filename']}")
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = logo_digest(data)
+        try:
+            filenames = store.acquire(digest, lambda: encode_logo(data, digest))
+        except InvalidImage as e:
+            print(f"Unreadable logo for party {party['_id']}: {e}")
+            continue
+        result = parties.update_one(dict(LEGACY_QUERY, _id=party['_id']), {'$set': logo_fields(digest, filenames)})
+        if result.modified_count:
+            adopted += 1
+        else:
+            store.release(digest)
+    return adopted
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Garbage-collect uploaded logos')
+    parser.add_argument('--grace', type=int, default=int(os.environ.get('UPLOAD_GC_GRACE', 3600)),
+                        help='seconds a file must be unreferenced before it is deleted')
+    parser.add_argument('--dry-run', action='store_true')
+    parser.add_argument('--adopt-legacy', action='store_true')
+    args = parser.parse_args()
+
+    db = get_db()
+    store = create_blob_store(lambda: db['blobs'])
+    parties = db['parties']
+
+    if args.adopt_legacy and not args.dry_run:
+        print(f"Adopted {adopt_legacy(store, parties)} legacy logos")
+
+    referenced = {party['logo_filename'] for party in parties.find(LEGACY_QUERY, {'logo_filename': 1})}
+    report = store.sweep(referenced, grace=args.grace, dry_run=args.dry_run)
+    verb = 'Would remove' if args.dry_run else 'Removed'
+    print(f"{verb} {report['blobs_removed']} orphaned blobs, {report['files_removed']} files "
+          f"({report['bytes_freed'] / 1024:.1f} KiB)")
+
+
+if __name__ == '__main__':
+    main()
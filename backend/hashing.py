@@ -0,0 +1,183 @@
+"""Password hashing service.
+
+Hashing and verification are CPU bound, so they run on a process pool
+instead of the request threads.  A bounded number of operations may be
+queued at once; callers beyond that wait briefly and then get
+HashingBusy, which keeps a login storm from piling up unbounded work.
+Bulk hashing is split into small chunks, at most half a pool's worth in
+flight, so logins never queue behind a whole import.
+The hash method is configurable, and hashes made with other parameters
+are reported by needs_rehash() so they can be upgraded on login.
+"""
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+BULK_CHUNK_SIZE = 4
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full"""
+
+
+class LatencyStats:
+    """Count, mean, max and recent percentiles of operation latency"""
+
+    def __init__(self, window=1000):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            self._recent.append(seconds)
+
+    def as_dict(self):
+        with self._lock:
+            recent = sorted(self._recent)
+            count, total, maximum = self.count, self.total, self.max
+
+        def pct(fraction):
+            return recent[min(len(recent) - 1, int(fraction * len(recent)))] * 1000 if recent else 0.0
+
+        return {
+            'count': count,
+            'mean_ms': (total / count * 1000) if count else 0.0,
+            'p50_ms': pct(0.50),
+            'p95_ms': pct(0.95),
+            'p99_ms': pct(0.99),
+            'max_ms': maximum * 1000
+        }
+
+
+def _hash_chunk(passwords, method):
+    return [generate_password_hash(password, method) for password in passwords]
+
+
+class PasswordHasher:
+    """Hash and verify passwords on a bounded process pool"""
+
+    def __init__(self, method='pbkdf2', workers=None, max_pending=None, queue_timeout=2.0):
+        self.method = method
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.max_pending = max_pending or max(1, self.workers) * 16
+        self.queue_timeout = queue_timeout
+        self._method_prefix = None
+        self.stats = {'hash': LatencyStats(), 'verify': LatencyStats()}
+        self.rejected = 0
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        # Pools do not survive fork; each server worker gets its own
+        with self._lock:
+            if self._pool is None or self._pool_pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _run(self, operation, func, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.rejected += 1
+            raise HashingBusy('Password hashing queue is full')
+        started = time.perf_counter()
+        try:
+            if self.workers == 0:
+                return func(*args)
+            return self._get_pool().submit(func, *args).result()
+        finally:
+            self._slots.release()
+            self.stats[operation].record(time.perf_counter() - started)
+
+    def hash(self, password):
+        return self._run('hash', generate_password_hash, password, self.method)
+
+    def verify(self, password, password_hash):
+        return self._run('verify', check_password_hash, password_hash, password)
+
+    def hash_many(self, passwords):
+        """Hash a batch (bulk imports), one queue slot per chunk in flight"""
+        if self.workers == 0:
+            return _hash_chunk(passwords, self.method)
+        pool = self._get_pool()
+        # Leave at least half the processes free for logins
+        in_flight = max(1, self.workers // 2)
+        hashes = []
+        pending = deque()
+
+        def collect():
+            future = pending.popleft()
+            try:
+                hashes.extend(future.result())
+            finally:
+                self._slots.release()
+
+        try:
+            for start in range(0, len(passwords), BULK_CHUNK_SIZE):
+                if len(pending) >= in_flight:
+                    collect()
+                if not self._slots.acquire(timeout=self.queue_timeout):
+                    self.rejected += 1
+                    raise HashingBusy('Password hashing queue is full')
+                pending.append(pool.submit(_hash_chunk, passwords[start:start + BULK_CHUNK_SIZE], self.method))
+            while pending:
+                collect()
+        finally:
+            while pending:
+                pending.popleft().cancel()
+                self._slots.release()
+        return hashes
+
+    @property
+    def method_prefix(self):
+        """Method prefix werkzeug stores in each hash (pbkdf2:sha256:600000 etc.)"""
+        if self._method_prefix is None:
+            self._method_prefix = generate_password_hash('', self.method).split('$', 1)[0]
+        return self._method_prefix
+
+    def needs_rehash(self, password_hash):
+        """True if a stored hash was made with different method or cost"""
+        return password_hash.split('$', 1)[0] != self.method_prefix
+
+    def as_dict(self):
+        return {
+            'method': self.method_prefix,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'rejected': self.rejected,
+            'hash': self.stats['hash'].as_dict(),
+            'verify': self.stats['verify'].as_dict()
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=False)
+            self._pool = None
+
+
+def create_hasher(workers=None):
+    """Build a hasher configured from the environment"""
+    if workers is None and os.environ.get('HASH_WORKERS'):
+        workers = int(os.environ['HASH_WORKERS'])
+    elif workers is None:
+        # Every server process has its own pool, so they share the CPUs
+        workers = max(1, (os.cpu_count() or 1) // int(os.environ.get('WEB_CONCURRENCY', 1)))
+    max_pending = os.environ.get('HASH_MAX_PENDING')
+    return PasswordHasher(
+        method=os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2'),
+        workers=workers,
+        max_pending=int(max_pending) if max_pending else None,
+        queue_timeout=float(os.environ.get('HASH_QUEUE_TIMEOUT', 2)),
+    )
@@ -0,0 +1,92 @@
+"""Party logo processing.
+
+Uploads are decoded with Pillow and re-encoded at bounded sizes as PNG
+or JPEG plus WebP, under names derived from a hash of the uploaded bytes.
+A file's name therefore changes whenever its content does, which lets it
+be served with a year-long immutable cache lifetime.  Storing the files
+is left to blobstore.py.
+"""
+import hashlib
+import io
+import os
+import re
+
+from PIL import Image, ImageOps
+
+# Longest edge of each variant: 'thumb' is what the pages render (2x the
+# 80px CSS box), 'large' bounds the copy kept in place of the original
+LOGO_SIZES = {
+    'thumb': int(os.environ.get('LOGO_THUMB_SIZE', 160)),
+    'large': int(os.environ.get('LOGO_MAX_SIZE', 1024)),
+}
+WEBP_QUALITY = int(os.environ.get('LOGO_WEBP_QUALITY', 80))
+JPEG_QUALITY = int(os.environ.get('LOGO_JPEG_QUALITY', 85))
+
+# Refuse images that would decode to more than this many pixels
+Image.MAX_IMAGE_PIXELS = int(os.environ.get('LOGO_MAX_PIXELS', 40000000))
+
+HASHED_NAME = re.compile(r'^[0-9a-f]{16}-(thumb|large)\.(png|jpg|webp)$')
+
+
+class InvalidImage(ValueError):
+    """Raised when an upload is not a decodable image"""
+
+
+def is_hashed_name(filename):
+    """True for content-addressed variant names, which never change content"""
+    return bool(HASHED_NAME.match(filename))
+
+
+def _load(data):
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (OSError, Image.DecompressionBombError) as e:
+        raise InvalidImage(str(e))
+    # Honour camera rotation, then drop the metadata with it
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    return image.convert('RGBA' if has_alpha else 'RGB'), has_alpha
+
+
+def _encode(image, fmt):
+    buffer = io.BytesIO()
+    if fmt == 'webp':
+        image.save(buffer, 'WEBP', quality=WEBP_QUALITY, method=4)
+    elif fmt == 'png':
+        image.save(buffer, 'PNG', optimize=True)
+    else:
+        image.save(buffer, 'JPEG', quality=JPEG_QUALITY, optimize=True, progressive=True)
+    return buffer.getvalue()
+
+
+def logo_digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def encode_logo(data, digest):
+    """Encode the variants of an uploaded logo; returns {filename: bytes}
+
+    Raises InvalidImage if the upload cannot be decoded.
+    """
+    image, has_alpha = _load(data)
+    fallback = 'png' if has_alpha else 'jpg'
+    files = {}
+    for variant, size in LOGO_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        for fmt in (fallback, 'webp'):
+            files[f"{digest}-{variant}.{fmt}"] = _encode(resized, fmt)
+    return files
+
+
+def logo_fields(digest, filenames):
+    """Party fields for a stored logo: ``logo_filename`` is the PNG/JPEG
+    thumbnail, ``logo_webp`` its WebP twin, ``logo_files`` every variant"""
+    thumbs = [name for name in filenames if name.startswith(f"{digest}-thumb.")]
+    return {
+        'logo_blob': digest,
+        'logo_filename': next(name for name in thumbs if not name.endswith('.webp')),
+        'logo_webp': next(name for name in thumbs if name.endswith('.webp')),
+        'logo_files': sorted(filenames)
+    }
@@ -0,0 +1,40 @@
+"""Register voters in bulk from a roster file.
+
+    python import_voters.py roster.csv
+    python import_voters.py roster.jsonl --chunk-size 2000 --workers 8
+
+CSV rosters need a header row with name, email, password and optionally
+student_id; JSON Lines rosters hold one object with the same keys per line.
+"""
+import argparse
+
+from db import get_db
+from hashing import create_hasher
+from voter_import import read_rows, import_voters, import_settings
+
+
+def main():
+    settings = import_settings()
+    parser = argparse.ArgumentParser(description='Bulk import voters')
+    parser.add_argument('roster', help='CSV or JSON Lines roster file')
+    parser.add_argument('--format', choices=['csv', 'jsonl'], help='default: from the file extension')
+    parser.add_argument('--chunk-size', type=int, default=settings['chunk_size'])
+    parser.add_argument('--workers', type=int, default=None, help='password hashing processes (default: HASH_WORKERS or CPU count)')
+    args = parser.parse_args()
+
+    fmt = args.format or ('jsonl' if args.roster.lower().endswith(('.jsonl', '.ndjson')) else 'csv')
+    hasher = create_hasher(workers=args.workers)
+    with open(args.roster, 'rb') as stream:
+        report = import_voters(get_db()['users'], read_rows(stream, fmt), hasher.hash_many,
+                               chunk_size=args.chunk_size)
+    hasher.shutdown()
+
+    print(f"Imported {report['inserted']} voters, {report['error_count']} rows rejected")
+    for error in report['errors']:
+        print(f"Row {error['row']}: {error['error']}")
+    if report['error_count'] > len(report['errors']):
+        print(f"... and {report['error_count'] - len(report['errors'])} more")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""Apply schema migrations; run once per deploy, before the web workers start
+
+    python init_db.py             # apply pending migrations
+    python init_db.py --status    # list migrations and whether they are applied
+    python init_db.py --advise    # explain each route's queries, flag COLLSCAN and in-memory SORT
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from db import get_db
+from migrations import migrate, status, advise
+
+
+def print_advice(findings):
+    flagged = 0
+    for finding in findings:
+        marker = 'WARN' if finding['problems'] else 'ok  '
+        indexes = ', '.join(finding['indexes']) or '-'
+        problems = f"  <- {', '.join(finding['problems'])}" if finding['problems'] else ''
+        print(f"{marker} {finding['route']:<18} {finding['collection']:<18} {indexes}{problems}")
+        flagged += bool(finding['problems'])
+    print(f"\n{flagged} of {len(findings)} queries need attention")
+    return flagged
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Database migrations and index advisor')
+    parser.add_argument('--status', action='store_true', help='list migrations')
+    parser.add_argument('--advise', action='store_true', help='explain route queries')
+    args = parser.parse_args()
+
+    try:
+        db = get_db()
+        if args.status:
+            for version, description, applied in status(db):
+                print(f"{version:>3} {'applied' if applied else 'pending':<8} {description}")
+        elif args.advise:
+            sys.exit(1 if print_advice(advise(db)) else 0)
+        elif migrate(db):
+            print("Database initialized successfully")
+        else:
+            sys.exit(1)
+    except Exception as e:
+        print(f"Database initialization error: {e}")
+        sys.exit(1)
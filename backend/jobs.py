@@ -0,0 +1,146 @@
+"""Background jobs for slow admin operations.
+
+Jobs are documents in the ``jobs`` collection, so their status can be read
+from any process.  Each process runs one worker thread that claims queued
+jobs atomically and runs the handler registered for the job type.  A
+running job's lease is renewed on a timer for as long as its handler runs;
+a job whose heartbeat stops (its process died) is claimed again by another
+worker, so handlers must be safe to re-run.  Every write a run makes is
+fenced on its claim (the ``attempts`` count), so a run that lost its lease
+raises LeaseLost instead of overwriting the new run's progress or result.
+Whatever a handler returns is stored as the job's ``result``.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class LeaseLost(Exception):
+    """The job was claimed again by another worker"""
+
+
+def _claim_filter(job):
+    return {'_id': job['_id'], 'status': RUNNING, 'attempts': job['attempts']}
+
+
+class JobRunner:
+    def __init__(self, get_job_collection, handlers, poll_interval=5.0, lease=60.0):
+        self.get_job_collection = get_job_collection
+        self.handlers = handlers
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def ensure_started(self):
+        # Threads do not survive fork, so start (or restart) per process
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name='job-runner', daemon=True)
+            self._pid = os.getpid()
+            self._thread.start()
+
+    def submit(self, job_type, **params):
+        """Queue a job; returns its id"""
+        now = datetime.now(timezone.utc)
+        result = self.get_job_collection().insert_one({
+            'type': job_type,
+            'params': params,
+            'status': QUEUED,
+            'progress': {},
+            'attempts': 0,
+            'created_at': now,
+            'heartbeat_at': now
+        })
+        self.ensure_started()
+        self._wake.set()
+        return result.inserted_id
+
+    def get(self, job_id):
+        return self.get_job_collection().find_one({'_id': job_id})
+
+    def holds(self, job):
+        """True while this run of ``job`` still holds its claim"""
+        return self.get_job_collection().count_documents(_claim_filter(job), limit=1) > 0
+
+    def _claim(self):
+        now = datetime.now(timezone.utc)
+        return self.get_job_collection().find_one_and_update(
+            {'$or': [
+                {'status': QUEUED},
+                {'status': RUNNING, 'heartbeat_at': {'$lt': now - timedelta(seconds=self.lease)}}
+            ]},
+            {'$set': {'status': RUNNING, 'started_at': now, 'heartbeat_at': now}, '$inc': {'attempts': 1}},
+            sort=[('created_at', 1)],
+            return_document=ReturnDocument.AFTER
+        )
+
+    def _execute(self, job):
+        jobs = self.get_job_collection()
+
+        claim = _claim_filter(job)
+
+        def progress(**counters):
+            """Record progress counters; raises LeaseLost if the job was claimed again"""
+            result = jobs.update_one(claim, {'$set': dict(
+                {f"progress.{name}": value for name, value in counters.items()},
+                heartbeat_at=datetime.now(timezone.utc))})
+            if not result.matched_count:
+                raise LeaseLost(f"Job {job['_id']} was claimed by another worker")
+
+        stop = threading.Event()
+
+        def keepalive():
+            # Renew the lease however long the handler goes without reporting progress
+            while not stop.wait(self.lease / 3):
+                if not jobs.update_one(claim, {'$set': {'heartbeat_at': datetime.now(timezone.utc)}}).matched_count:
+                    return
+
+        threading.Thread(target=keepalive, name=f"job-{job['_id']}-lease", daemon=True).start()
+        try:
+            result = self.handlers[job['type']](job, progress)
+            update = {'status': DONE, 'result': result}
+        except LeaseLost as e:
+            print(f"Job {job['_id']} ({job['type']}) abandoned: {e}")
+            return
+        except Exception as e:
+            print(f"Job {job['_id']} ({job['type']}) error: {e}")
+            update = {'status': FAILED, 'error': str(e)}
+        finally:
+            stop.set()
+        update['finished_at'] = datetime.now(timezone.utc)
+        jobs.update_one(claim, {'$set': update})
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            try:
+                job = self._claim()
+                while job is not None:
+                    self._execute(job)
+                    job = self._claim()
+            except Exception as e:
+                print(f"Job runner error: {e}")
+                time.sleep(self.poll_interval)
+
+
+def create_job_runner(get_job_collection, handlers):
+    """Build a runner configured from JOB_POLL_INTERVAL and JOB_LEASE"""
+    return JobRunner(
+        get_job_collection,
+        handlers,
+        poll_interval=float(os.environ.get('JOB_POLL_INTERVAL', 5)),
+        lease=float(os.environ.get('JOB_LEASE', 60)),
+    )
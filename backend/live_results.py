@@ -0,0 +1,155 @@
+"""Server-Sent Events fan-out for live election results.
+
+One producer thread per election polls the tally at a fixed interval,
+diffs it against the previous reading and pushes compact delta events to
+every subscriber queue, so the number of viewers no longer multiplies the
+number of database reads.  A producer stops once its last subscriber
+leaves.
+
+Every open stream holds a server thread, so each process accepts at most
+``max_subscribers`` streams; pages beyond that fall back to polling.
+"""
+import json
+import os
+import queue
+import threading
+import time
+
+
+class StreamsFull(Exception):
+    """This process already serves its maximum number of streams"""
+
+
+def format_event(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+class Subscription:
+    """Iterator of SSE messages for one connected viewer"""
+
+    def __init__(self, election_id, keepalive, max_backlog):
+        self.election_id = election_id
+        self.keepalive = keepalive
+        self.queue = queue.Queue(maxsize=max_backlog)
+        self.closed = False
+
+    def push(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            # A viewer that cannot keep up is dropped rather than buffered
+            self.closed = True
+
+    def __iter__(self):
+        while not self.closed:
+            try:
+                yield self.queue.get(timeout=self.keepalive)
+            except queue.Empty:
+                yield ': keepalive\n\n'
+
+
+class Fanout:
+    """Subscribers and last reading per election; diffs readings into events
+
+    Shared by the thread-per-election broadcaster below and the asyncio one
+    in async_api.py.  Subscribers only need a ``push(message)`` method.
+    """
+
+    def __init__(self, load_counts, interval, keepalive, max_backlog):
+        self.load_counts = load_counts
+        self.interval = interval
+        self.keepalive = keepalive
+        self.max_backlog = max_backlog
+        self._subscribers = {}
+        self._latest = {}
+        self._producers = {}
+        self._lock = threading.Lock()
+
+    def _publish(self, election_id, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(election_id, ()))
+        for subscription in subscribers:
+            subscription.push(message)
+
+    def _publish_counts(self, election_id, previous, counts):
+        """Push a snapshot (first reading) or a delta of the changed parties; returns the reading to diff next"""
+        if counts is None or counts == previous:
+            return previous
+        snapshot = {'total': sum(counts.values()), 'parties': counts}
+        with self._lock:
+            self._latest[election_id] = snapshot
+        if previous is None:
+            self._publish(election_id, format_event('snapshot', snapshot))
+        else:
+            changed = {party_id: votes for party_id, votes in counts.items() if previous.get(party_id) != votes}
+            self._publish(election_id, format_event('delta', {'total': snapshot['total'], 'parties': changed}))
+        return counts
+
+    def _stop_if_idle(self, election_id):
+        """True, forgetting the election, once its last subscriber has left"""
+        with self._lock:
+            if self._subscribers.get(election_id):
+                return False
+            self._subscribers.pop(election_id, None)
+            self._latest.pop(election_id, None)
+            self._producers.pop(election_id, None)
+            return True
+
+
+class ResultsBroadcaster(Fanout):
+    """Share one results producer thread per election among all its subscribers"""
+
+    def __init__(self, load_counts, interval=2.0, keepalive=15.0, max_backlog=100, max_subscribers=None):
+        super().__init__(load_counts, interval, keepalive, max_backlog)
+        self.max_subscribers = max_subscribers
+
+    def subscribe(self, election_id):
+        subscription = Subscription(election_id, self.keepalive, self.max_backlog)
+        with self._lock:
+            if self.max_subscribers is not None and \
+                    sum(len(subscribers) for subscribers in self._subscribers.values()) >= self.max_subscribers:
+                raise StreamsFull()
+            self._subscribers.setdefault(election_id, set()).add(subscription)
+            latest = self._latest.get(election_id)
+            producer = self._producers.get(election_id)
+            if producer is None or not producer.is_alive():
+                producer = threading.Thread(target=self._produce, args=(election_id,),
+                                            name=f'results-{election_id}', daemon=True)
+                self._producers[election_id] = producer
+                producer.start()
+
+        # Late joiners start from the producer's last reading
+        if latest is not None:
+            subscription.push(format_event('snapshot', latest))
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.election_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+        subscription.closed = True
+
+    def _produce(self, election_id):
+        previous = None
+        while not self._stop_if_idle(election_id):
+            try:
+                counts = {str(party_id): votes for party_id, votes in self.load_counts(election_id).items()}
+            except Exception as e:
+                print(f"Results stream error: {e}")
+                counts = previous
+
+            previous = self._publish_counts(election_id, previous, counts)
+            time.sleep(self.interval)
+
+
+def create_broadcaster(load_counts):
+    """Build a broadcaster configured from the environment"""
+    # By default a quarter of a gthread worker's threads may hold streams
+    default_max = max(1, int(os.environ.get('WEB_THREADS', 8)) // 4)
+    return ResultsBroadcaster(
+        load_counts,
+        interval=float(os.environ.get('RESULTS_STREAM_INTERVAL', 2)),
+        keepalive=float(os.environ.get('RESULTS_STREAM_KEEPALIVE', 15)),
+        max_subscribers=int(os.environ.get('RESULTS_STREAM_MAX_SUBSCRIBERS', default_max)),
+    )
@@ -0,0 +1,215 @@
+"""Request and MongoDB metrics in the Prometheus text format.
+
+Flask request hooks time every request by endpoint, and a pymongo command
+listener counts and times the commands each request issues (commands run
+by background threads are timed but not attributed to a request).
+Commands slower than a threshold are logged with the shape of their
+filter, with values replaced by ``?``, and counted by that shape.
+
+Metrics are kept per process; with several server workers each scrape of
+``/metrics`` reports the worker that answered it.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from flask import g, request
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMAND_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34)
+MAX_SLOW_COMMANDS = 100
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, values=(), amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for values, total in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labels, values)} {total}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, values, amount):
+        with self._lock:
+            series = self._series.get(values)
+            if series is None:
+                series = self._series[values] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if amount <= bound:
+                    series[0][index] += 1
+            series[1] += amount
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for values, (bucket_counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, bucket_counts):
+                    labels = _format_labels(self.labels, values, [('le', bound)])
+                    lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+                labels = _format_labels(self.labels, values, [('le', '+Inf')])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {total}")
+                lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {count}")
+        return lines
+
+
+def query_shape(value):
+    """A filter with every value replaced by '?', keeping field and operator names"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and value and all(isinstance(item, dict) for item in value):
+        return [query_shape(item) for item in value]
+    return '?'
+
+
+def command_filter(command_name, command):
+    """The part of a command that selects documents"""
+    if command_name in ('find', 'count', 'distinct'):
+        return command.get('filter', command.get('query'))
+    if command_name == 'findAndModify':
+        return command.get('query')
+    if command_name == 'aggregate':
+        return [{stage: query_shape(spec) if stage == '$match' else '...'}
+                for pipeline_stage in command.get('pipeline', []) for stage, spec in pipeline_stage.items()]
+    if command_name in ('update', 'delete'):
+        statements = command.get('updates' if command_name == 'update' else 'deletes') or [{}]
+        return statements[0].get('q')
+    return None
+
+
+class MetricsCollector(monitoring.CommandListener):
+    """Flask request hooks plus a pymongo command listener sharing one registry"""
+
+    def __init__(self, slow_command_ms=100.0):
+        self.slow_command_seconds = slow_command_ms / 1000
+        self.started_at = time.time()
+        self._local = threading.local()
+        self.slow_commands = deque(maxlen=MAX_SLOW_COMMANDS)
+
+        self.requests = Counter('voting_http_requests_total', 'HTTP requests by endpoint, method and status',
+                                ('endpoint', 'method', 'status'))
+        self.request_seconds = Histogram('voting_http_request_duration_seconds', 'HTTP request latency',
+                                         ('endpoint',))
+        self.request_commands = Histogram('voting_mongo_commands_per_request', 'MongoDB commands issued per request',
+                                          ('endpoint',), buckets=COMMAND_COUNT_BUCKETS)
+        self.request_mongo_seconds = Histogram('voting_mongo_seconds_per_request',
+                                               'Time spent in MongoDB commands per request', ('endpoint',))
+        self.command_seconds = Histogram('voting_mongo_command_duration_seconds', 'MongoDB command latency',
+                                         ('command', 'collection'))
+        self.command_failures = Counter('voting_mongo_command_failures_total', 'Failed MongoDB commands',
+                                        ('command', 'collection'))
+        self.slow = Counter('voting_mongo_slow_commands_total', 'MongoDB commands over the slow threshold by filter shape',
+                            ('command', 'collection', 'shape'))
+
+    # Flask hooks
+
+    def install(self, app):
+        monitoring.register(self)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+
+    def _before_request(self):
+        g.metrics_started = time.perf_counter()
+        self._local.request = {'commands': 0, 'mongo_seconds': 0.0}
+
+    def _after_request(self, response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _teardown_request(self, error=None):
+        started = g.pop('metrics_started', None)
+        usage = getattr(self._local, 'request', None)
+        self._local.request = None
+        if started is None:
+            return
+        endpoint = request.endpoint or 'unmatched'
+        status = g.pop('metrics_status', 500)
+        self.requests.inc((endpoint, request.method, str(status)))
+        self.request_seconds.observe((endpoint,), time.perf_counter() - started)
+        if usage is not None:
+            self.request_commands.observe((endpoint,), usage['commands'])
+            self.request_mongo_seconds.observe((endpoint,), usage['mongo_seconds'])
+
+    # pymongo CommandListener
+
+    def started(self, event):
+        commands = getattr(self._local, 'commands', None)
+        if commands is None:
+            commands = self._local.commands = {}
+        collection = event.command.get(event.command_name)
+        commands[event.request_id] = (collection if isinstance(collection, str) else '', event.command)
+
+    def _finished(self, event):
+        commands = getattr(self._local, 'commands', None) or {}
+        collection, command = commands.pop(event.request_id, ('', None))
+        seconds = event.duration_micros / 1e6
+        self.command_seconds.observe((event.command_name, collection), seconds)
+
+        usage = getattr(self._local, 'request', None)
+        if usage is not None:
+            usage['commands'] += 1
+            usage['mongo_seconds'] += seconds
+
+        if seconds >= self.slow_command_seconds and command is not None:
+            shape = str(query_shape(command_filter(event.command_name, command)))
+            self.slow.inc((event.command_name, collection, shape))
+            endpoint = request.endpoint if usage is not None else None
+            self.slow_commands.append({'command': event.command_name, 'collection': collection,
+                                       'shape': shape, 'ms': seconds * 1000, 'endpoint': endpoint})
+            print(f"Slow MongoDB command: {event.command_name} {collection} {shape} "
+                  f"{seconds * 1000:.1f}ms (endpoint: {endpoint or '-'})")
+        return collection
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        collection = self._finished(event)
+        self.command_failures.inc((event.command_name, collection))
+
+    def render(self):
+        lines = ['# HELP voting_process_start_time_seconds Start time of this worker process',
+                 '# TYPE voting_process_start_time_seconds gauge',
+                 f'voting_process_start_time_seconds {self.started_at}']
+        for metric in (self.requests, self.request_seconds, self.request_commands, self.request_mongo_seconds,
+                       self.command_seconds, self.command_failures, self.slow):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def create_metrics():
+    """Build a collector configured from METRICS_SLOW_COMMAND_MS"""
+    return MetricsCollector(slow_command_ms=float(os.environ.get('METRICS_SLOW_COMMAND_MS', 100)))
@@ -0,0 +1,244 @@
+"""Versioned schema migrations and an index advisor.
+
+Each migration declares the indexes it creates and drops (plus an optional
+data step).  ``migrate()`` applies the migrations not yet recorded in the
+``schema_migrations`` collection, in order, then re-creates any declared
+index that has gone missing, so running it on every deploy is safe.
+
+``advise()`` explains the queries behind each route and flags plans that
+scan a whole collection (COLLSCAN) or sort in memory (SORT).
+"""
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from pymongo.errors import OperationFailure
+
+from ballots import TOKEN_FIELD
+from results import vote_count_pipeline
+
+MIGRATIONS_COLLECTION = 'schema_migrations'
+
+
+class Migration:
+    def __init__(self, version, description, create=(), drop=(), run=None):
+        self.version = version
+        self.description = description
+        # (collection, keys, options) and (collection, index name)
+        self.create = create
+        self.drop = drop
+        self.run = run
+
+
+MIGRATIONS = [
+    Migration(1, 'Baseline indexes', create=[
+        ('users', [('email', 1)], {'unique': True}),
+        # Duplicate checks in register() and the bulk voter import
+        ('users', [('student_id', 1)], {}),
+        # Keyset pagination of the admin voter list
+        ('users', [('is_admin', 1), ('_id', 1)], {}),
+        ('elections', [('created_at', -1), ('_id', -1)], {}),
+        ('elections', [('start_time', -1)], {}),
+        ('votes', [('voter_id', 1), ('election_id', 1)], {'unique': True}),
+        # Covers the tally reconciliation aggregation and batched deletes
+        ('votes', [('election_id', 1), ('party_id', 1)], {}),
+        # Party lookups by election, ranked by votes
+        ('parties', [('election_id', 1), ('votes', -1)], {}),
+        # Queued and stalled background jobs, oldest first
+        ('jobs', [('status', 1), ('created_at', 1)], {}),
+        # History of live results snapshots per election
+        ('result_snapshots', [('election_id', 1), ('bucket_start', -1)], {}),
+        # Only orphaned logo blobs, for the gc_uploads sweep
+        ('blobs', [('orphaned_at', 1)], {'name': 'orphaned_blobs', 'partialFilterExpression': {'refs': {'$lte': 0}}}),
+        # Shared identity records (SESSION_BACKEND=mongo)
+        ('sessions', [('expires_at', 1)], {'expireAfterSeconds': 0}),
+        ('sessions', [('user_id', 1)], {}),
+        # Shared login rate limit counters (RATE_LIMIT_BACKEND=mongo)
+        ('rate_limits', [('expires_at', 1)], {'expireAfterSeconds': 0}),
+    ]),
+]
+
+
+def index_name(keys, options):
+    """Name MongoDB gives an index unless one is set explicitly"""
+    return options.get('name') or '_'.join(f"{field}_{direction}" for field, direction in keys)
+
+
+def declared_indexes(migrations=MIGRATIONS):
+    """Indexes the migrations leave in place, as (collection, keys, options)"""
+    indexes = {}
+    for migration in migrations:
+        for collection, keys, options in migration.create:
+            indexes[(collection, index_name(keys, options))] = (collection, keys, options)
+        for collection, name in migration.drop:
+            indexes.pop((collection, name), None)
+    return list(indexes.values())
+
+
+def _create(db, collection, keys, options):
+    try:
+        db[collection].create_index(keys, **options)
+        return True
+    except Exception as e:
+        print(f"{collection} index {keys} creation warning: {e}")
+        return False
+
+
+def _apply(db, migration):
+    ok = all([_create(db, collection, keys, options) for collection, keys, options in migration.create])
+    for collection, name in migration.drop:
+        try:
+            db[collection].drop_index(name)
+        except OperationFailure as e:
+            # Already gone
+            if e.code != 27:
+                print(f"{collection} index {name} drop warning: {e}")
+                ok = False
+    if ok and migration.run is not None:
+        migration.run(db)
+    return ok
+
+
+def applied_versions(db):
+    return {doc['_id'] for doc in db[MIGRATIONS_COLLECTION].find({}, {'_id': 1})}
+
+
+def migrate(db, migrations=MIGRATIONS):
+    """Apply pending migrations in order; returns False if one failed"""
+    applied = applied_versions(db)
+    for migration in migrations:
+        if migration.version in applied:
+            continue
+        print(f"Applying migration {migration.version}: {migration.description}")
+        if not _apply(db, migration):
+            print(f"Migration {migration.version} failed; later migrations were not applied")
+            return False
+        db[MIGRATIONS_COLLECTION].update_one(
+            {'_id': migration.version},
+            {'$set': {'description': migration.description, 'applied_at': datetime.now(timezone.utc)}},
+            upsert=True
+        )
+
+    # Re-create declared indexes dropped by hand since they were applied
+    existing = {}
+    ok = True
+    for collection, keys, options in declared_indexes(migrations):
+        if collection not in existing:
+            existing[collection] = {tuple(index['key'].items()) for index in db[collection].list_indexes()}
+        if tuple(keys) not in existing[collection]:
+            ok = _create(db, collection, keys, options) and ok
+    return ok
+
+
+def status(db, migrations=MIGRATIONS):
+    """(version, description, applied) for every migration"""
+    applied = applied_versions(db)
+    return [(migration.version, migration.description, migration.version in applied) for migration in migrations]
+
+
+# --- Index advisor ---
+
+def route_queries(samples):
+    """(route, collection, query spec) for the queries behind each route"""
+    election_id = samples['election_id']
+    voter_id = samples['voter_id']
+    return [
+        ('voter_login', 'users', {'filter': {'email': samples['email'], 'is_admin': False}}),
+        ('register', 'users', {'filter': {'email': samples['email']}}),
+        ('register', 'users', {'filter': {'student_id': samples['student_id']}}),
+        ('admin_dashboard', 'elections', {'filter': {}, 'sort': [('created_at', -1), ('_id', -1)], 'limit': 51}),
+        ('admin_dashboard', 'users', {'filter': {'is_admin': False}, 'projection': {'_id': 1}}),
+        ('api_admin_voters', 'users', {'filter': {'is_admin': False}, 'sort': [('_id', 1)], 'limit': 51}),
+        ('voter_dashboard', 'elections', {'pipeline': [
+            {'$match': {'deleting': {'$ne': True}, 'start_time': {'$exists': True}, 'end_time': {'$exists': True}}},
+            {'$sort': {'start_time': -1}}
+        ]}),
+        ('vote', 'elections', {'filter': {'_id': election_id, 'deleting': {'$ne': True}}}),
+        ('vote', 'parties', {'filter': {'election_id': election_id}}),
+        ('vote', 'votes', {'filter': {'voter_id': voter_id, 'election_id': election_id},
+                           'projection': {'_id': 0, 'election_id': 1}}),
+        ('vote', 'votes', {'filter': {'voter_id': voter_id, 'election_id': election_id},
+                           'projection': {'_id': 0, TOKEN_FIELD: 1}}),
+        ('voter_login', 'votes', {'filter': {'voter_id': voter_id}, 'projection': {'_id': 0, 'election_id': 1}}),
+        ('election_results', 'parties', {'filter': {'election_id': election_id}}),
+        ('election_results', 'votes', {'pipeline': vote_count_pipeline(election_id)}),
+        ('tally_reconcile', 'votes', {'pipeline': vote_count_pipeline(election_id)}),
+        ('election_results', 'result_snapshots', {'filter': {'election_id': election_id},
+                                                  'sort': [('bucket_start', -1)], 'limit': 1}),
+        ('delete_election', 'votes', {'filter': {'election_id': election_id}, 'projection': {'_id': 1},
+                                      'limit': 5000}),
+        ('delete_election', 'jobs', {'filter': {'$or': [{'status': 'queued'}, {'status': 'running'}]},
+                                     'sort': [('created_at', 1)], 'limit': 1}),
+        ('gc_uploads', 'blobs', {'filter': {'refs': {'$lte': 0}, 'orphaned_at': {'$lt': datetime.now(timezone.utc)}}}),
+        # The schedule index reads every election by design
+        ('schedule', 'elections', {'filter': {'deleting': {'$ne': True}}, 'full_scan': True}),
+    ]
+
+
+def _winning_plans(explain):
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == 'winningPlan':
+                yield value.get('queryPlan', value)
+            else:
+                yield from _winning_plans(value)
+    elif isinstance(explain, list):
+        for item in explain:
+            yield from _winning_plans(item)
+
+
+def _stages(plan):
+    yield plan.get('stage'), plan.get('indexName')
+    for key in ('inputStage', 'thenStage', 'elseStage', 'outerStage', 'innerStage'):
+        if key in plan:
+            yield from _stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from _stages(child)
+
+
+def explain(db, collection, spec):
+    if 'pipeline' in spec:
+        return db.command('explain', {'aggregate': collection, 'pipeline': spec['pipeline'], 'cursor': {}},
+                          verbosity='queryPlanner')
+    cursor = db[collection].find(spec['filter'], spec.get('projection'))
+    if spec.get('sort'):
+        cursor = cursor.sort(spec['sort'])
+    if spec.get('limit'):
+        cursor = cursor.limit(spec['limit'])
+    return cursor.explain()
+
+
+def sample_values(db):
+    """Real ids and keys where the database has them, so plans match production"""
+    user = db['users'].find_one({'is_admin': False}, {'email': 1, 'student_id': 1}) or {}
+    election = db['elections'].find_one({}, {'_id': 1}) or {}
+    return {
+        'voter_id': user.get('_id', ObjectId()),
+        'email': user.get('email', 'advisor@example.com'),
+        'student_id': user.get('student_id', 'ADVISOR'),
+        'election_id': election.get('_id', ObjectId()),
+    }
+
+
+def advise(db):
+    """Explain each route's queries; returns a list of findings"""
+    findings = []
+    for route, collection, spec in route_queries(sample_values(db)):
+        try:
+            stages = [stage for plan in _winning_plans(explain(db, collection, spec)) for stage in _stages(plan)]
+        except Exception as e:
+            findings.append({'route': route, 'collection': collection, 'problems': [f"explain failed: {e}"],
+                             'indexes': []})
+            continue
+        names = [name for name, _ in stages]
+        problems = []
+        if 'COLLSCAN' in names and not spec.get('full_scan'):
+            problems.append('COLLSCAN')
+        if 'SORT' in names:
+            problems.append('in-memory SORT')
+        findings.append({
+            'route': route,
+            'collection': collection,
+            'problems': problems,
+            'indexes': sorted({index for _, index in stages if index})
+        })
+    return findings
@@ -0,0 +1,62 @@
+"""Keyset (cursor) pagination over MongoDB collections.
+
+Pages are ordered by ``(sort_field, _id)`` and continued with an opaque
+cursor holding the last row's sort key, so every page is an index range
+scan instead of a growing ``skip``.
+"""
+import base64
+
+from bson import json_util
+
+ASCENDING = 1
+DESCENDING = -1
+
+
+def encode_cursor(document, sort_field):
+    key = [document.get(sort_field), document['_id']]
+    return base64.urlsafe_b64encode(json_util.dumps(key).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Return (sort_value, _id) from a cursor; raises ValueError if malformed"""
+    try:
+        value, last_id = json_util.loads(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise ValueError('Invalid cursor')
+    return value, last_id
+
+
+def page_query(query, sort_field='_id', direction=ASCENDING, cursor=None):
+    """(filter, sort) selecting the rows after ``cursor``"""
+    query = dict(query)
+    comparison = '$gt' if direction == ASCENDING else '$lt'
+
+    if cursor:
+        value, last_id = decode_cursor(cursor)
+        if sort_field == '_id':
+            query['_id'] = {comparison: last_id}
+        else:
+            query['$or'] = [
+                {sort_field: {comparison: value}},
+                {sort_field: value, '_id': {comparison: last_id}}
+            ]
+
+    sort = [('_id', direction)] if sort_field == '_id' else [(sort_field, direction), ('_id', direction)]
+    return query, sort
+
+
+def finish_page(documents, limit, sort_field='_id'):
+    """Trim the probe row fetched past ``limit``; returns (documents, next_cursor)"""
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1], sort_field)
+    return documents, next_cursor
+
+
+def paginate(collection, query, sort_field='_id', direction=ASCENDING,
+             limit=50, cursor=None, projection=None):
+    """Return (documents, next_cursor); next_cursor is None on the last page"""
+    query, sort = page_query(query, sort_field, direction, cursor)
+    documents = list(collection.find(query, projection).sort(sort).limit(limit + 1))
+    return finish_page(documents, limit, sort_field)
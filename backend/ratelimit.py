@@ -0,0 +1,185 @@
+"""Sliding-window rate limiting for the login routes.
+
+Each limit keeps a counter for the current and previous fixed window and
+estimates the rolling count as ``previous * (1 - elapsed) + current``, so
+a key costs two integers no matter how many attempts it sees.  Counters
+live in process memory by default; the Mongo backend shares them across
+worker processes and expires them with a TTL index.
+
+Failed passwords are counted per client IP and per account, and both
+limits are checked before the user lookup and hash verification run.
+Successful logins are not counted, so voters sharing a campus NAT do not
+use up each other's allowance when polls open.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+
+class RateLimited(Exception):
+    """Raised when a limit is exceeded; ``retry_after`` is in seconds"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _window(window, now):
+    index = int(now // window)
+    return index, (now - index * window) / window
+
+
+def _estimate(previous, current, elapsed):
+    return previous * (1 - elapsed) + current
+
+
+class LocalBackend:
+    """Counters in this process's memory"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def _counter(self, key, index):
+        counter = self._counters.get(key)
+        if counter is None or counter[0] < index - 1:
+            counter = [index, 0, 0]
+        elif counter[0] == index - 1:
+            counter = [index, 0, counter[1]]
+        self._counters[key] = counter
+        return counter
+
+    def _purge(self, index):
+        for key in [key for key, counter in self._counters.items() if counter[0] < index - 1]:
+            del self._counters[key]
+        # Still full of live keys: drop the oldest insertions
+        while len(self._counters) >= self.max_keys:
+            del self._counters[next(iter(self._counters))]
+
+    def hit(self, key, window, amount=1, now=None):
+        index, elapsed = _window(window, time.time() if now is None else now)
+        with self._lock:
+            if key not in self._counters and len(self._counters) >= self.max_keys:
+                self._purge(index)
+            counter = self._counter(key, index)
+            counter[1] += amount
+            return _estimate(counter[2], counter[1], elapsed)
+
+    def peek(self, key, window, now=None):
+        index, elapsed = _window(window, time.time() if now is None else now)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None or counter[0] < index - 1:
+                return 0
+            if counter[0] == index - 1:
+                return _estimate(counter[1], 0, elapsed)
+            return _estimate(counter[2], counter[1], elapsed)
+
+    def reset(self, key, window):
+        with self._lock:
+            self._counters.pop(key, None)
+
+
+class MongoBackend:
+    """Counters shared by every process through a MongoDB collection
+
+    One document per key and window, removed by a TTL index on ``expires_at``.
+    """
+
+    def __init__(self, get_collection):
+        self.get_collection = get_collection
+
+    def _ids(self, key, index):
+        return f"{key}:{index}", f"{key}:{index - 1}"
+
+    def _previous(self, collection, previous_id):
+        doc = collection.find_one({'_id': previous_id}, {'count': 1})
+        return doc['count'] if doc else 0
+
+    def hit(self, key, window, amount=1, now=None):
+        index, elapsed = _window(window, time.time() if now is None else now)
+        current_id, previous_id = self._ids(key, index)
+        collection = self.get_collection()
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=2 * window)
+        doc = collection.find_one_and_update(
+            {'_id': current_id},
+            {'$inc': {'count': amount}, '$setOnInsert': {'expires_at': expires_at}},
+            projection={'count': 1},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return _estimate(self._previous(collection, previous_id), doc['count'], elapsed)
+
+    def peek(self, key, window, now=None):
+        index, elapsed = _window(window, time.time() if now is None else now)
+        current_id, previous_id = self._ids(key, index)
+        counts = {doc['_id']: doc['count'] for doc in
+                  self.get_collection().find({'_id': {'$in': [current_id, previous_id]}}, {'count': 1})}
+        return _estimate(counts.get(previous_id, 0), counts.get(current_id, 0), elapsed)
+
+    def reset(self, key, window):
+        index, _ = _window(window, time.time())
+        self.get_collection().delete_many({'_id': {'$in': list(self._ids(key, index))}})
+
+
+class LoginThrottle:
+    """Per-IP and per-account lockout after failed passwords"""
+
+    def __init__(self, backend, ip_limit=30, ip_window=60, account_limit=5, account_window=900):
+        self.backend = backend
+        self.ip_limit = ip_limit
+        self.ip_window = ip_window
+        self.account_limit = account_limit
+        self.account_window = account_window
+        self.rejected = 0
+
+    def _account_key(self, email):
+        return f"login:account:{email.strip().lower()}"
+
+    def check(self, ip, email):
+        """Raise RateLimited if ``ip`` or the account has too many recent failures"""
+        try:
+            if self.ip_limit and self.backend.peek(f"login:ip:{ip}", self.ip_window) >= self.ip_limit:
+                self.rejected += 1
+                raise RateLimited('Too many login attempts', self.ip_window)
+            if self.account_limit and self.backend.peek(self._account_key(email), self.account_window) >= self.account_limit:
+                self.rejected += 1
+                raise RateLimited('Account temporarily locked', self.account_window)
+        except RateLimited:
+            raise
+        except Exception as e:
+            # A broken shared store must not lock everyone out
+            print(f"Rate limit check error: {e}")
+
+    def failed(self, ip, email):
+        try:
+            if self.ip_limit:
+                self.backend.hit(f"login:ip:{ip}", self.ip_window)
+            self.backend.hit(self._account_key(email), self.account_window)
+        except Exception as e:
+            print(f"Rate limit update error: {e}")
+
+    def succeeded(self, email):
+        try:
+            self.backend.reset(self._account_key(email), self.account_window)
+        except Exception as e:
+            print(f"Rate limit reset error: {e}")
+
+
+def create_login_throttle(get_collection):
+    """Build the login throttle from the environment; ``get_collection`` backs the mongo store"""
+    if os.environ.get('RATE_LIMIT_BACKEND', 'local') == 'mongo':
+        backend = MongoBackend(get_collection)
+    else:
+        backend = LocalBackend(max_keys=int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000)))
+    return LoginThrottle(
+        backend,
+        ip_limit=int(os.environ.get('LOGIN_IP_LIMIT', 30)),
+        ip_window=float(os.environ.get('LOGIN_IP_WINDOW', 60)),
+        account_limit=int(os.environ.get('LOGIN_ACCOUNT_LIMIT', 5)),
+        account_window=float(os.environ.get('LOGIN_ACCOUNT_WINDOW', 900)),
+    )
@@ -0,0 +1,188 @@
+"""Materialized election results.
+
+While an election is active its results are ranked from the live tally,
+and a cumulative snapshot is written at most once per time bucket to
+``result_snapshots`` (with the votes gained since the previous bucket),
+giving a history of the count without any extra work per request.
+
+Once an election has ended (plus a short delay for ballots still being
+flushed) its results cannot change, so one aggregation over ``votes``
+produces a frozen ``results`` document: totals, percentages, ranks and
+turnout, checked against the denormalized ``parties.votes`` counts.
+Ended elections are then served only from that document.
+"""
+import copy
+import os
+import threading
+from datetime import datetime, timezone
+
+from pymongo import DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from cache import TTLCache
+
+# Party fields copied into results for display
+PARTY_FIELDS = ('name', 'description', 'logo_filename', 'logo_webp')
+
+
+def vote_count_pipeline(election_id):
+    """Ballots per party; covered by the votes(election_id, party_id) index"""
+    return [
+        {'$match': {'election_id': election_id}},
+        {'$group': {'_id': '$party_id', 'count': {'$sum': 1}}}
+    ]
+
+
+def rank_parties(parties, counts, eligible_voters):
+    """Results dict for parties given {party_id: votes}; ties share a rank"""
+    total = sum(counts.get(party['_id'], 0) for party in parties)
+    ranked = []
+    for party in parties:
+        entry = {field: party.get(field) for field in PARTY_FIELDS}
+        entry['_id'] = party['_id']
+        entry['election_id'] = party['election_id']
+        entry['votes'] = counts.get(party['_id'], 0)
+        entry['percentage'] = (entry['votes'] / total * 100) if total > 0 else 0
+        ranked.append(entry)
+    ranked.sort(key=lambda entry: entry['votes'], reverse=True)
+
+    for position, entry in enumerate(ranked):
+        tied = position and entry['votes'] == ranked[position - 1]['votes']
+        entry['rank'] = ranked[position - 1]['rank'] if tied else position + 1
+
+    return {
+        'total_votes': total,
+        'eligible_voters': eligible_voters,
+        'turnout': (total / eligible_voters * 100) if eligible_voters else 0,
+        'parties': ranked
+    }
+
+
+class ResultsMaterializer:
+    def __init__(self, get_results_collection, get_snapshot_collection, get_vote_collection,
+                 get_party_collection, count_voters, snapshot_interval=60.0, finalize_delay=30.0):
+        self.get_results_collection = get_results_collection
+        self.get_snapshot_collection = get_snapshot_collection
+        self.get_vote_collection = get_vote_collection
+        self.get_party_collection = get_party_collection
+        self.count_voters = count_voters
+        self.snapshot_interval = snapshot_interval
+        self.finalize_delay = finalize_delay
+        # Final results never change, so they only leave the cache when evicted
+        self._final = TTLCache('final_results', maxsize=1024, ttl=7 * 24 * 3600)
+        self._voters = TTLCache('eligible_voters', maxsize=1, ttl=snapshot_interval)
+        self._last_snapshot = {}
+        self._lock = threading.Lock()
+
+    def is_final(self, bounds, now):
+        """True once an election with (start, end) epoch ``bounds`` ended long enough ago to freeze"""
+        return bounds is not None and now >= bounds[1] + self.finalize_delay
+
+    def eligible_voters(self):
+        return self._voters.get_or_load('voters', self.count_voters)
+
+    def live(self, election_id, parties, counts):
+        """Results ranked from live counts; records this bucket's snapshot if not yet written"""
+        results = rank_parties(parties, counts, self.eligible_voters())
+        results.update({'election_id': election_id, 'final': False,
+                        'computed_at': datetime.now(timezone.utc)})
+        try:
+            self._record_snapshot(election_id, counts, results['total_votes'])
+        except Exception as e:
+            print(f"Results snapshot error: {e}")
+        return results
+
+    def _record_snapshot(self, election_id, counts, total):
+        now = datetime.now(timezone.utc)
+        bucket = int(now.timestamp() // self.snapshot_interval)
+        with self._lock:
+            last = self._last_snapshot.get(election_id)
+            if last is not None and last[0] >= bucket:
+                return
+            self._last_snapshot[election_id] = (bucket, total)
+
+        snapshots = self.get_snapshot_collection()
+        if last is None:
+            previous = snapshots.find_one({'election_id': election_id}, {'total_votes': 1},
+                                          sort=[('bucket_start', DESCENDING)])
+            previous_total = previous['total_votes'] if previous else 0
+        else:
+            previous_total = last[1]
+        try:
+            snapshots.insert_one({
+                '_id': f"{election_id}:{bucket}",
+                'election_id': election_id,
+                'bucket_start': datetime.fromtimestamp(bucket * self.snapshot_interval, timezone.utc),
+                'counts': {str(party_id): count for party_id, count in counts.items()},
+                'total_votes': total,
+                'new_votes': total - previous_total
+            })
+        except DuplicateKeyError:
+            # Another process wrote this bucket first
+            pass
+
+    def final(self, election_id):
+        """Frozen results document of an ended election, materializing it on first use"""
+        doc = self._final.get_or_load(election_id, lambda: self._load_final(election_id))
+        return copy.deepcopy(doc)
+
+    def _load_final(self, election_id):
+        doc = self.get_results_collection().find_one({'_id': election_id})
+        return doc if doc is not None else self.finalize(election_id)
+
+    def finalize(self, election_id):
+        """Count the votes collection once and store the frozen results document"""
+        pipeline = vote_count_pipeline(election_id)
+        counts = {row['_id']: row['count'] for row in self.get_vote_collection().aggregate(pipeline)}
+        parties = list(self.get_party_collection().find({'election_id': election_id}))
+
+        # Verify and repair the denormalized per-party counters
+        mismatched = [party for party in parties if party.get('votes', 0) != counts.get(party['_id'], 0)]
+        if mismatched:
+            self.get_party_collection().bulk_write(
+                [UpdateOne({'_id': party['_id']}, {'$set': {'votes': counts.get(party['_id'], 0)}})
+                 for party in mismatched],
+                ordered=False
+            )
+
+        doc = rank_parties(parties, counts, self.count_voters())
+        doc.update({
+            '_id': election_id,
+            'election_id': election_id,
+            'final': True,
+            'computed_at': datetime.now(timezone.utc),
+            'corrected_parties': len(mismatched),
+            # Ballots for parties that no longer exist
+            'unmatched_votes': sum(count for party_id, count in counts.items()
+                                   if party_id not in {party['_id'] for party in parties})
+        })
+        try:
+            self.get_results_collection().insert_one(doc)
+        except DuplicateKeyError:
+            # Materialized concurrently elsewhere; serve the stored copy
+            doc = self.get_results_collection().find_one({'_id': election_id})
+        return doc
+
+    def forget(self, election_id):
+        """Drop stored results and snapshots of a deleted election"""
+        self._final.invalidate(election_id)
+        with self._lock:
+            self._last_snapshot.pop(election_id, None)
+        self.get_results_collection().delete_one({'_id': election_id})
+        self.get_snapshot_collection().delete_many({'election_id': election_id})
+
+    def stats(self):
+        return self._final.stats()
+
+
+def create_materializer(get_collection, get_vote_collection, get_party_collection, count_voters):
+    """Build a materializer configured from RESULTS_SNAPSHOT_INTERVAL and RESULTS_FINALIZE_DELAY"""
+    return ResultsMaterializer(
+        lambda: get_collection('results'),
+        lambda: get_collection('result_snapshots'),
+        get_vote_collection,
+        get_party_collection,
+        count_voters,
+        snapshot_interval=float(os.environ.get('RESULTS_SNAPSHOT_INTERVAL', 60)),
+        finalize_delay=float(os.environ.get('RESULTS_FINALIZE_DELAY', 30)),
+    )
@@ -0,0 +1,139 @@
+"""Election schedule index.
+
+Keeps every election's start/end boundaries as UTC epoch seconds in two
+sorted arrays, so "how many elections are upcoming/active/ended at time T" is
+answered with binary search instead of re-parsing each election's times
+on every dashboard render.  The index is rebuilt lazily after an election
+is created or deleted and at a fixed interval, which picks up changes made
+by other worker processes.
+"""
+import bisect
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+# Elections written with this marker store their times as UTC; older
+# documents hold naive server-local times
+TZ_FIELD = 'tz'
+TZ_UTC = 'UTC'
+
+
+def to_utc(value, stored_as_utc=False):
+    """Normalize a stored datetime or ISO string to an aware UTC datetime"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        if stored_as_utc:
+            return value.replace(tzinfo=timezone.utc)
+        # Naive legacy values are server-local; astimezone() assumes that
+        return value.astimezone(timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def election_bounds(election):
+    """(start, end) of an election as UTC epoch seconds, or None if unparseable"""
+    stored_as_utc = election.get(TZ_FIELD) == TZ_UTC
+    start = to_utc(election.get('start_time'), stored_as_utc)
+    end = to_utc(election.get('end_time'), stored_as_utc)
+    if start is None or end is None:
+        return None
+    return start.timestamp(), end.timestamp()
+
+
+def localize(election):
+    """Replace stored times with aware server-local datetimes for display"""
+    stored_as_utc = election.get(TZ_FIELD) == TZ_UTC
+    for field in ('start_time', 'end_time'):
+        value = to_utc(election.get(field), stored_as_utc)
+        if value is not None:
+            election[field] = value.astimezone()
+    return election
+
+
+def status_at(bounds, now):
+    if bounds is None:
+        return 'unknown'
+    start, end = bounds
+    if now < start:
+        return 'upcoming'
+    elif now <= end:
+        return 'active'
+    return 'ended'
+
+
+class ElectionSchedule:
+    """Sorted start/end boundaries of all elections"""
+
+    def __init__(self, load_elections, refresh_interval=30.0):
+        self.load_elections = load_elections
+        self.refresh_interval = refresh_interval
+        self._bounds = {}
+        self._starts = []
+        self._ends = []
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        """Force a rebuild on the next lookup (election created or deleted)"""
+        with self._lock:
+            self._loaded_at = None
+
+    def _ensure_loaded(self):
+        with self._lock:
+            loaded_at = self._loaded_at
+        if loaded_at is not None and time.monotonic() - loaded_at < self.refresh_interval:
+            return
+
+        bounds = {}
+        for election in self.load_elections():
+            bounds[election['_id']] = election_bounds(election)
+        known = [b for b in bounds.values() if b is not None]
+        starts = sorted(b[0] for b in known)
+        ends = sorted(b[1] for b in known)
+
+        with self._lock:
+            self._bounds = bounds
+            self._starts = starts
+            self._ends = ends
+            self._loaded_at = time.monotonic()
+
+    def bounds(self, election):
+        """Cached boundaries for an election document, parsed on a miss"""
+        self._ensure_loaded()
+        with self._lock:
+            if election['_id'] in self._bounds:
+                return self._bounds[election['_id']]
+        return election_bounds(election)
+
+    def status(self, election, now=None):
+        now = time.time() if now is None else now
+        return status_at(self.bounds(election), now)
+
+    def counts(self, now=None):
+        """Number of elections per status at ``now`` in O(log n)"""
+        now = time.time() if now is None else now
+        self._ensure_loaded()
+        with self._lock:
+            total = len(self._starts)
+            upcoming = total - bisect.bisect_right(self._starts, now)
+            ended = bisect.bisect_left(self._ends, now)
+            return {
+                'upcoming': upcoming,
+                'active': total - upcoming - ended,
+                'ended': ended,
+                'unknown': len(self._bounds) - total
+            }
+
+
+def create_schedule(load_elections):
+    """Build a schedule index configured from the environment"""
+    return ElectionSchedule(
+        load_elections,
+        refresh_interval=float(os.environ.get('SCHEDULE_REFRESH_INTERVAL', 30)),
+    )
@@ -0,0 +1,123 @@
+"""Server-side identity records for logged-in users.
+
+The signed Flask session cookie carries only a random session id; the
+record it points to holds what authenticated pages need (user id, name,
+email, student ID, role and the elections already voted in), so those
+pages render without reading the users collection.  Records live in
+process memory by default, or in a TTL-indexed ``sessions`` collection
+shared by every worker, which is the default when gunicorn runs more
+than one worker (``WEB_CONCURRENCY``).  A record that has expired or was
+invalidated is simply rebuilt from the database on the next request;
+anything that changes or deletes accounts calls ``invalidate_user(s)``.
+"""
+import hashlib
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+
+from cache import TTLCache
+
+
+def new_session_id():
+    return secrets.token_urlsafe(32)
+
+
+def build_identity(user, voted=()):
+    """Compact identity record from a user document and the election ids voted in"""
+    return {
+        'user_id': str(user['_id']),
+        'name': user['name'],
+        'email': user.get('email'),
+        'student_id': user.get('student_id'),
+        'is_admin': bool(user.get('is_admin')),
+        'voted': sorted({str(election_id) for election_id in voted})
+    }
+
+
+class LocalSessionStore:
+    """Identity records cached in this process"""
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        self._cache = TTLCache('sessions', maxsize=maxsize, ttl=ttl)
+
+    def get(self, sid):
+        identity = self._cache.get(sid)
+        return dict(identity, voted=list(identity['voted'])) if identity else None
+
+    def save(self, sid, identity):
+        self._cache.set(sid, identity)
+
+    def add_vote(self, sid, election_id):
+        identity = self.get(sid)
+        if identity is not None and str(election_id) not in identity['voted']:
+            identity['voted'].append(str(election_id))
+            self._cache.set(sid, identity)
+
+    def delete(self, sid):
+        self._cache.invalidate(sid)
+
+    def invalidate_user(self, user_id):
+        self.invalidate_users([user_id])
+
+    def invalidate_users(self, user_ids):
+        user_ids = {str(user_id) for user_id in user_ids}
+        self._cache.invalidate_where(lambda identity: identity['user_id'] in user_ids)
+
+    def stats(self):
+        return self._cache.stats()
+
+
+class MongoSessionStore:
+    """Identity records shared through a MongoDB collection
+
+    Documents are keyed by a hash of the session id, so a database dump does
+    not yield usable cookies, and removed by a TTL index on ``expires_at``.
+    """
+
+    def __init__(self, get_collection, ttl=3600):
+        self.get_collection = get_collection
+        self.ttl = ttl
+
+    def _key(self, sid):
+        return hashlib.sha256(sid.encode()).hexdigest()
+
+    def get(self, sid):
+        doc = self.get_collection().find_one(
+            {'_id': self._key(sid), 'expires_at': {'$gt': datetime.now(timezone.utc)}},
+            {'identity': 1}
+        )
+        return doc['identity'] if doc else None
+
+    def save(self, sid, identity):
+        self.get_collection().replace_one({'_id': self._key(sid)}, {
+            'user_id': identity['user_id'],
+            'identity': identity,
+            'expires_at': datetime.now(timezone.utc) + timedelta(seconds=self.ttl)
+        }, upsert=True)
+
+    def add_vote(self, sid, election_id):
+        self.get_collection().update_one({'_id': self._key(sid)},
+                                         {'$addToSet': {'identity.voted': str(election_id)}})
+
+    def delete(self, sid):
+        self.get_collection().delete_one({'_id': self._key(sid)})
+
+    def invalidate_user(self, user_id):
+        self.invalidate_users([user_id])
+
+    def invalidate_users(self, user_ids):
+        self.get_collection().delete_many({'user_id': {'$in': [str(user_id) for user_id in user_ids]}})
+
+    def stats(self):
+        return {'name': 'sessions', 'size': self.get_collection().estimated_document_count(), 'ttl': self.ttl}
+
+
+def create_session_store(get_collection):
+    """Build the store from SESSION_BACKEND, SESSION_TTL and SESSION_MAX_ENTRIES"""
+    ttl = float(os.environ.get('SESSION_TTL', 3600))
+    # Records in one worker's memory are missed by the others, and every
+    # miss re-reads the user and rotates the session id
+    default = 'mongo' if int(os.environ.get('WEB_CONCURRENCY', 1)) > 1 else 'local'
+    if os.environ.get('SESSION_BACKEND', default) == 'mongo':
+        return MongoSessionStore(get_collection, ttl=ttl)
+    return LocalSessionStore(maxsize=int(os.environ.get('SESSION_MAX_ENTRIES', 10000)), ttl=ttl)
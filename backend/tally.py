@@ -0,0 +1,140 @@
+"""In-memory vote tally.
+
+Committed ballots bump sharded per-process counters keyed by
+(election, party) instead of ``$inc``-ing one hot party document per ballot.
+Each election's counts are periodically reconciled against the ``votes``
+collection with a single aggregation, which also repairs the denormalized
+``parties.votes`` field.  Pages that show counts read them from the tally.
+"""
+import itertools
+import os
+import threading
+import time
+
+from pymongo import UpdateOne
+
+from results import vote_count_pipeline
+
+
+class TallyEngine:
+    """Sharded per-process counters reconciled against the votes collection"""
+
+    def __init__(self, get_vote_collection, get_party_collection,
+                 shards=16, reconcile_interval=10.0):
+        self.get_vote_collection = get_vote_collection
+        self.get_party_collection = get_party_collection
+        self.reconcile_interval = reconcile_interval
+        self._shards = [({}, threading.Lock()) for _ in range(shards)]
+        self._thread_numbers = itertools.count()
+        self._local = threading.local()
+        self._base = {}
+        self._reconciled_at = {}
+        self._election_locks = {}
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        # Thread idents are aligned addresses, so number threads on first use instead
+        number = getattr(self._local, 'number', None)
+        if number is None:
+            number = self._local.number = next(self._thread_numbers)
+        return self._shards[number % len(self._shards)]
+
+    def increment(self, election_id, party_id, count=1):
+        """Record ballots committed by this process"""
+        deltas, lock = self._shard()
+        key = (election_id, party_id)
+        with lock:
+            deltas[key] = deltas.get(key, 0) + count
+
+    def _pending(self, election_id, clear=False):
+        pending = {}
+        for deltas, lock in self._shards:
+            with lock:
+                for key in [key for key in deltas if key[0] == election_id]:
+                    pending[key[1]] = pending.get(key[1], 0) + deltas[key]
+                    if clear:
+                        del deltas[key]
+        return pending
+
+    def _snapshot(self, election_id):
+        """Per-shard copy of an election's deltas"""
+        snapshot = []
+        for deltas, lock in self._shards:
+            with lock:
+                snapshot.append({key: count for key, count in deltas.items() if key[0] == election_id})
+        return snapshot
+
+    def _subtract(self, snapshot):
+        for (deltas, lock), taken in zip(self._shards, snapshot):
+            with lock:
+                for key, count in taken.items():
+                    remaining = deltas.get(key, 0) - count
+                    if remaining:
+                        deltas[key] = remaining
+                    else:
+                        deltas.pop(key, None)
+
+    def reconcile(self, election_id, wait=True):
+        """Replace the counts for an election with the totals in the votes collection"""
+        with self._lock:
+            election_lock = self._election_locks.setdefault(election_id, threading.Lock())
+        # Readers that already have counts skip a reconcile another thread is running
+        if not election_lock.acquire(blocking=wait):
+            return
+
+        try:
+            pipeline = vote_count_pipeline(election_id)
+            counts = {row['_id']: row['count'] for row in self.get_vote_collection().aggregate(pipeline)}
+
+            # Ballots are committed before they are counted locally, so every
+            # delta recorded by now is in the aggregate (which must read the
+            # primary); later deltas are kept
+            taken = self._snapshot(election_id)
+            with self._lock:
+                self._base[election_id] = counts
+                self._reconciled_at[election_id] = time.monotonic()
+                self._subtract(taken)
+
+            if counts:
+                self.get_party_collection().bulk_write(
+                    [UpdateOne({'_id': party_id, 'votes': {'$ne': count}}, {'$set': {'votes': count}})
+                     for party_id, count in counts.items()],
+                    ordered=False
+                )
+        except Exception as e:
+            print(f"Tally reconcile error: {e}")
+        finally:
+            election_lock.release()
+
+    def counts(self, election_id):
+        """Current vote count per party id for an election"""
+        with self._lock:
+            reconciled_at = self._reconciled_at.get(election_id)
+        if reconciled_at is None:
+            self.reconcile(election_id)
+        elif time.monotonic() - reconciled_at >= self.reconcile_interval:
+            self.reconcile(election_id, wait=False)
+
+        with self._lock:
+            counts = dict(self._base.get(election_id, {}))
+        for party_id, count in self._pending(election_id).items():
+            counts[party_id] = counts.get(party_id, 0) + count
+        return counts
+
+    def forget(self, election_id):
+        """Drop all state for a deleted election"""
+        self._pending(election_id, clear=True)
+        with self._lock:
+            self._base.pop(election_id, None)
+            self._reconciled_at.pop(election_id, None)
+            self._election_locks.pop(election_id, None)
+
+
+def create_tally(get_vote_collection, get_party_collection):
+    """Build a tally engine configured from the environment"""
+    return TallyEngine(
+        get_vote_collection,
+        get_party_collection,
+        shards=int(os.environ.get('TALLY_SHARDS', 16)),
+        reconcile_interval=float(os.environ.get('TALLY_RECONCILE_INTERVAL', 10)),
+    )
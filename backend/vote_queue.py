@@ -0,0 +1,162 @@
+"""Write-behind ingestion pipeline for ballots.
+
+Accepted ballots are put on an in-process queue and committed by a
+background flusher in batches: one ``insert_many(ordered=False)`` for the
+vote documents, after which the aggregated per-party increments are handed
+to the tally engine in one call.  Every ballot gets a ticket that is
+resolved only once its batch has been acknowledged by MongoDB.
+"""
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import Counter
+
+from pymongo.errors import BulkWriteError
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class BallotTicket:
+    """Acknowledgement handle for a single queued ballot"""
+
+    def __init__(self, vote_data):
+        self.vote_data = vote_data
+        self.status = 'pending'
+        self.error = None
+        self._done = threading.Event()
+
+    def resolve(self, status, error=None):
+        self.status = status
+        self.error = error
+        self._done.set()
+
+    def wait(self, timeout=None):
+        """Block until the ballot is acknowledged; returns False on timeout"""
+        return self._done.wait(timeout)
+
+
+class VoteWriteBehind:
+    """Queue ballots and commit them from a background flusher thread"""
+
+    def __init__(self, get_vote_collection, on_commit,
+                 flush_size=100, flush_interval=0.05, max_pending=10000):
+        self.get_vote_collection = get_vote_collection
+        self.on_commit = on_commit
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # Threads do not survive fork, so start (or restart) per process
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid() and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='vote-flusher', daemon=True)
+            self._thread.start()
+
+    def submit(self, vote_data, timeout=1.0):
+        """Queue a ballot and return its ticket; raises queue.Full under backpressure, RuntimeError once drained"""
+        if self._stop.is_set():
+            raise RuntimeError('Vote pipeline is shutting down')
+        self._ensure_started()
+        ticket = BallotTicket(vote_data)
+        self._queue.put(ticket, timeout=timeout)
+        return ticket
+
+    def _next_batch(self):
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.flush_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self.flush(batch)
+
+    def flush(self, tickets):
+        """Commit a batch of tickets and resolve each one"""
+        documents = [ticket.vote_data for ticket in tickets]
+        failed = {}
+
+        try:
+            self.get_vote_collection().insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                failed[error['index']] = error
+        except Exception as e:
+            print(f"Vote flush error: {e}")
+            for ticket in tickets:
+                ticket.resolve('failed', e)
+            return
+
+        increments = Counter()
+        for index, ticket in enumerate(tickets):
+            if index not in failed:
+                increments[(ticket.vote_data['election_id'], ticket.vote_data['party_id'])] += 1
+
+        if increments:
+            try:
+                self.on_commit(increments)
+            except Exception as e:
+                # The ballots themselves are durable; counters are repairable
+                print(f"Vote commit callback error: {e}")
+
+        for index, ticket in enumerate(tickets):
+            error = failed.get(index)
+            if error is None:
+                ticket.resolve('recorded')
+            elif error.get('code') == DUPLICATE_KEY_ERROR:
+                ticket.resolve('duplicate', error.get('errmsg'))
+            else:
+                ticket.resolve('failed', error.get('errmsg'))
+
+    def drain(self, timeout=30):
+        """Stop accepting ballots and flush everything still queued"""
+        self._stop.set()
+        thread = self._thread
+        if thread is not None and thread.is_alive() and self._pid == os.getpid():
+            thread.join(timeout)
+        # Anything left (flusher never started or timed out) is flushed inline
+        leftovers = []
+        while True:
+            try:
+                leftovers.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(leftovers), self.flush_size):
+            self.flush(leftovers[start:start + self.flush_size])
+
+
+def create_pipeline(get_vote_collection, on_commit):
+    """Build a pipeline configured from the environment and drain it at exit"""
+    pipeline = VoteWriteBehind(
+        get_vote_collection,
+        on_commit,
+        flush_size=int(os.environ.get('VOTE_FLUSH_SIZE', 100)),
+        flush_interval=float(os.environ.get('VOTE_FLUSH_INTERVAL_MS', 50)) / 1000.0,
+        max_pending=int(os.environ.get('VOTE_MAX_PENDING', 10000)),
+    )
+    atexit.register(pipeline.drain)
+    return pipeline
@@ -0,0 +1,197 @@
+"""Bulk registration of voters from CSV or JSON Lines rosters.
+
+Rows are streamed, validated and de-duplicated in memory against the
+emails and student IDs already registered (read with index-only scans),
+their passwords hashed in bulk by the hashing service, and the accepted rows written
+with chunked ``insert_many(ordered=False)``.  Bad rows are reported with
+their line number without aborting the rest of the import.
+
+Rosters uploaded through the admin dashboard are imported by a background
+job; the upload is kept in the ``rosters`` collection in chunks until the
+job has read it.
+"""
+import csv
+import io
+import json
+import os
+from datetime import datetime
+
+from bson import Binary, ObjectId
+from pymongo.errors import BulkWriteError, OperationFailure
+
+DUPLICATE_KEY_ERROR = 11000
+MAX_REPORTED_ERRORS = 1000
+ROSTER_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+def read_rows(stream, fmt='csv'):
+    """Yield (line_number, row dict) from a binary roster stream"""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_number, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f"Unsupported roster format: {fmt}")
+
+
+def save_roster(rosters, stream):
+    """Store an uploaded roster for a background import; returns its id"""
+    roster_id = ObjectId()
+    number = 0
+    while True:
+        data = stream.read(ROSTER_CHUNK_BYTES)
+        if not data:
+            break
+        rosters.insert_one({'roster_id': roster_id, 'n': number, 'data': Binary(data),
+                            'created_at': datetime.now()})
+        number += 1
+    return roster_id
+
+
+class _ChunkReader(io.RawIOBase):
+    """Read-only file over an iterable of byte strings"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, target):
+        while not self._buffer:
+            self._buffer = next(self._chunks, None)
+            if self._buffer is None:
+                self._buffer = b''
+                return 0
+        size = min(len(target), len(self._buffer))
+        target[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def open_roster(rosters, roster_id):
+    """Binary stream over a stored roster, read one chunk at a time"""
+    chunks = rosters.find({'roster_id': roster_id}).sort('n', 1)
+    return io.BufferedReader(_ChunkReader(bytes(chunk['data']) for chunk in chunks))
+
+
+def _indexed_values(users, field):
+    # Projecting only the indexed field with a hint makes this an index-only scan
+    try:
+        docs = list(users.find({}, {'_id': 0, field: 1}).hint([(field, 1)]))
+    except OperationFailure:
+        docs = list(users.find({}, {'_id': 0, field: 1}))
+    return {doc[field] for doc in docs if doc.get(field)}
+
+
+def load_existing_keys(users):
+    """Registered emails and student IDs"""
+    return _indexed_values(users, 'email'), _indexed_values(users, 'student_id')
+
+
+def validate_row(row, emails, student_ids):
+    """Return (user document without password hash, password) or raise ValueError"""
+    if row is None:
+        raise ValueError('Malformed row')
+    name = str(row.get('name') or '').strip()
+    email = str(row.get('email') or '').strip()
+    password = str(row.get('password') or '')
+    student_id = str(row.get('student_id') or '').strip()
+
+    if not all([name, email, password]):
+        raise ValueError('Name, email, and password are required')
+    if '@' not in email:
+        raise ValueError(f"Invalid email: {email}")
+    if email in emails:
+        raise ValueError(f"Email already registered: {email}")
+    if student_id and student_id in student_ids:
+        raise ValueError(f"Student ID already registered: {student_id}")
+
+    user_id = ObjectId()
+    user = {
+        '_id': user_id,
+        'name': name,
+        'email': email,
+        'student_id': student_id or f"USER_{user_id}",
+        'is_admin': False,
+        'created_at': datetime.now()
+    }
+    emails.add(email)
+    student_ids.add(user['student_id'])
+    return user, password
+
+
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.error_count = 0
+        self.errors = []
+
+    def error(self, line_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': line_number, 'error': message})
+
+    def as_dict(self):
+        return {'inserted': self.inserted, 'error_count': self.error_count, 'errors': self.errors}
+
+
+def _write_chunk(users, chunk, hash_many, report):
+    hashes = hash_many([password for _, _, password in chunk])
+    documents = []
+    for (_, user, _), password_hash in zip(chunk, hashes):
+        user['password_hash'] = password_hash
+        documents.append(user)
+
+    try:
+        result = users.insert_many(documents, ordered=False)
+        report.inserted += len(result.inserted_ids)
+    except BulkWriteError as e:
+        report.inserted += e.details.get('nInserted', 0)
+        for error in e.details.get('writeErrors', []):
+            line_number = chunk[error['index']][0]
+            if error.get('code') == DUPLICATE_KEY_ERROR:
+                report.error(line_number, 'Already registered')
+            else:
+                report.error(line_number, error.get('errmsg', 'Write failed'))
+
+
+def import_voters(users, rows, hash_many, chunk_size=1000):
+    """Register voters from (line_number, row) pairs; returns the report as a dict
+
+    ``hash_many`` maps a list of passwords to their hashes.
+    """
+    report = ImportReport()
+    emails, student_ids = load_existing_keys(users)
+
+    chunk = []
+    for line_number, row in rows:
+        try:
+            user, password = validate_row(row, emails, student_ids)
+        except ValueError as e:
+            report.error(line_number, str(e))
+            continue
+        chunk.append((line_number, user, password))
+        if len(chunk) >= chunk_size:
+            _write_chunk(users, chunk, hash_many, report)
+            chunk = []
+    if chunk:
+        _write_chunk(users, chunk, hash_many, report)
+
+    return report.as_dict()
+
+
+def import_settings():
+    """Chunk size from the environment"""
+    return {'chunk_size': int(os.environ.get('IMPORT_CHUNK_SIZE', 1000))}
@@ -0,0 +1,43 @@
+"""Gunicorn settings for production: gunicorn -c gunicorn.conf.py wsgi:app"""
+import multiprocessing
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+
+# Processes x threads; ballots and page views are I/O bound on MongoDB
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Exported so per-process pools (HASH_WORKERS) can size themselves
+os.environ['WEB_CONCURRENCY'] = str(workers)
+threads = int(os.environ.get('WEB_THREADS', 8))
+# uvicorn.workers.UvicornWorker serves asgi:app (the async API plus Flask)
+worker_class = os.environ.get('WEB_WORKER_CLASS', 'gthread')
+
+timeout = int(os.environ.get('WEB_TIMEOUT', 30))
+# Time workers get to finish in-flight requests after SIGTERM
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+
+# Recycle workers periodically to bound memory growth
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 1000))
+
+# Importing the app before forking is safe: MongoClient and background
+# threads are created lazily in each worker
+preload_app = os.environ.get('WEB_PRELOAD', '1') == '1'
+
+accesslog = '-'
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    from db import close_client
+    # Drop any client inherited from the master; the worker opens its own
+    close_client()
+
+
+def worker_exit(server, worker):
+    from app import shutdown
+    shutdown()
@@ -1,5 +1,11 @@
 import os
-from backend.app import app
+import sys
+
+# backend/ modules import each other as top-level modules, so the app is
+# imported as `app` too (server hooks import it by that name)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'backend'))
+
+from app import app
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5000))